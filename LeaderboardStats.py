@@ -1,39 +1,67 @@
 import requests
-import csv
 import os
 import datetime
 import time
-import json
+import argparse
+import asyncio
+import aiohttp
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
 import pandas as pd
 import pyarrow.parquet as pq
-
-# API Endpoints
-LEADERBOARD_URL = "https://mrapi.org/api/leaderboard"
-PLAYER_API_URL = "https://mrapi.org/api/player/{}"
-PLAYER_UPDATE_URL = "https://mrapi.org/api/player-update/{}"
-MATCH_API_URL = "https://mrapi.org/api/match/{}"
+from rate_limiter import RateLimiter, endpoint_name
+from frontier import Frontier, CrawlBudget, player_priority, match_priority
+from crawl_index import CrawlIndex
+from response_cache import ResponseCache
+from api_fixtures import open_recorder
+from crawl_checkpoint import CrawlCheckpoint
+from csv_sink import CsvSink
+from player_registry import PlayerRegistry, PLAYER_REGISTRY_DIR
+from crawl_metrics import CrawlMetrics, METRICS_FILE
+from single_flight import ClaimSet, SingleFlight, AsyncSingleFlight
+from match_players_store import (append_match_players, append_match_player_heroes, MATCH_PLAYERS_SCHEMA,
+                                 MATCH_PLAYER_HEROES_SCHEMA)
+from columnar_buffer import ColumnarBuffer
+from api_payloads import loads
+from leaderboard_snapshots import LeaderboardSnapshots, LEADERBOARD_SNAPSHOTS_DIR, migrate_csv
+
+# API Endpoints (MRAPI_BASE_URL points the crawler at a replay server, see api_fixtures.py)
+API_BASE_URL = os.getenv("MRAPI_BASE_URL", "https://mrapi.org/api/")
+LEADERBOARD_URL = API_BASE_URL + "leaderboard"
+PLAYER_API_URL = API_BASE_URL + "player/{}"
+PLAYER_UPDATE_URL = API_BASE_URL + "player-update/{}"
+MATCH_API_URL = API_BASE_URL + "match/{}"
 
 # Filenames
 LEADERBOARD_FILE = "data/historical/leaderboard.csv"
-PLAYER_ENCOUNTERS_FILE = "data/historical/player_encounters.csv"
+# Where leaderboard rows go: "csv", "snapshots" (keyframes + deltas, see leaderboard_snapshots.py) or "both"
+leaderboard_storage = os.getenv("LEADERBOARD_STORAGE", "both")
+PLAYER_ENCOUNTERS_FILE = "data/historical/player_encounters.csv"  # Old format, imported into the registry once
 MATCHES_FILE = "data/historical/matches.csv"
 MATCH_PLAYERS_FILE = "data/historical/match_players/"
+MATCH_PLAYER_HEROES_FILE = "data/historical/match_player_heroes/"
+CRAWL_INDEX_FILE = "data/historical/crawl_index.sqlite"
+CHECKPOINT_DIR = ".crawl_state/"
 
 # Constants
 MAX_PARALLEL_REQUESTS = 10  # Keep this low to avoid hitting API limits
+ASYNC_CONCURRENCY = 30  # Max in-flight requests for the asyncio crawler (one shared connection pool)
+PLAYER_REFRESH_SECONDS = 30 * 60  # Don't re-fetch players fetched less than this long ago (by any run)
+CHECKPOINT_INTERVAL = 5 * 60  # Seconds between crawl checkpoints in --async mode
+UPDATE_LEAD_SECONDS = 10  # Seconds between a player-update trigger and the profile read, so the refresh can finish
+UPDATE_WINDOW = 100  # Max players triggered ahead whose profile read has not started (--async mode)
 API_LIMIT = 480  # Max API calls per minute is 500 but we do 480 to be safe
-API_DELAY = 60 / API_LIMIT  # Time per request to stay within limits
-headers = {"x-api-key": os.getenv("API_KEY")}
-# Rate Limiting
-request_count = 0
-start_time = time.time()
-lock = Lock()
-private_profile_count = 0
-
-#thread savety
-encountered_lock = Lock() 
+headers = {"x-api-key": os.getenv("API_KEY", "")}
+# One keep-alive connection pool shared by every thread
+http_session = requests.Session()
+http_adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=MAX_PARALLEL_REQUESTS)
+http_session.mount("https://", http_adapter)
+http_session.mount("http://", http_adapter)
+# Rate Limiting (one token bucket shared by every thread and task)
+rate_limiter = RateLimiter(API_LIMIT)
+response_cache = ResponseCache()  # Player and match responses shared with the other scripts
+fixture_recorder = open_recorder()  # Records every response when MRAPI_RECORD is set
+metrics = CrawlMetrics()  # Counters, queue depths and latencies, written to METRICS_FILE
+
 match_extra_info = {}
 
 def load_existing_matches():
@@ -52,88 +80,150 @@ def load_existing_matches():
     return existing_matches
 
 def load_existing_players():
-    """Loads existing players and their scores to avoid duplicates."""
-    if not os.path.exists(PLAYER_ENCOUNTERS_FILE):
-        return {}
-
-    players = {}
-    with open(PLAYER_ENCOUNTERS_FILE, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            players[row["player_uid"]] = {
-                "player_name": row["player_name"],
-                "highest_score": int(row["highest_score"]) if row["highest_score"].isdigit() else 0,
-                "latest_score": int(row["latest_score"]) if row["latest_score"].isdigit() else 0,
-                "matches": int(row["matches"]) if row["matches"].isdigit() else 0,
-                "wins": int(row["wins"]) if row["wins"].isdigit() else 0,
-            }
+    """Loads the registry of encountered players and their scores (see player_registry.py)."""
+    players = PlayerRegistry(PLAYER_REGISTRY_DIR, legacy_csv=PLAYER_ENCOUNTERS_FILE)
     print(f"Loaded {len(players)} existing encountered players.")
     return players
 
 
+def load_crawl_index():
+    """Opens the persistent match/player index, seeding it from matches.csv the first time."""
+    index = CrawlIndex(CRAWL_INDEX_FILE)
+    if index.count("match") == 0 and os.path.exists(MATCHES_FILE):
+        index.mark_many("match", load_existing_matches(), fetched_at=0)
+        index.commit()
+    print(f"Crawl index holds {index.count('match')} matches and {index.count('player')} players.")
+    return index
+
+
+# Match players and their per-hero rows, held as typed columns and appended to the
+# partitioned datasets every FLUSH_ROWS rows, at each checkpoint and at the end of the run
+def unix_timestamps(values):
+    """Match timestamps (unix seconds, or "" if unknown) as datetimes."""
+    return pd.to_datetime(pd.Series(values, dtype=object), errors="coerce", unit="s")
+
+
+def write_match_players(table):
+    written = append_match_players(table, MATCH_PLAYERS_FILE)
+    metrics.inc("rows_written", table.num_rows, sink="match_players")
+    print(f"Saved {table.num_rows} match player rows in {len(written)} new files under {MATCH_PLAYERS_FILE}")
+
+
+def write_match_player_heroes(table):
+    written = append_match_player_heroes(table, MATCH_PLAYER_HEROES_FILE)
+    metrics.inc("rows_written", table.num_rows, sink="match_player_heroes")
+    print(f"Saved {table.num_rows} match player hero rows in {len(written)} new files under {MATCH_PLAYER_HEROES_FILE}")
+
+
+match_players_data = ColumnarBuffer(MATCH_PLAYERS_SCHEMA, write_match_players,
+                                    converters={"match_timestamp": unix_timestamps})
+match_player_heroes_data = ColumnarBuffer(MATCH_PLAYER_HEROES_SCHEMA, write_match_player_heroes,
+                                          converters={"match_timestamp": unix_timestamps})
+# Rows recorded since the last checkpoint, for its journals (None: this crawl writes no checkpoints)
+journal_rows = None
+
+
+def start_journal():
+    global journal_rows
+    journal_rows = {"matches": [], "match_players": [], "match_player_heroes": []}
+
+
+def take_journal_rows():
+    """The rows recorded since the last call, emptying the lists for the next checkpoint."""
+    if journal_rows is None:
+        return {}
+    taken = dict(journal_rows)
+    for name in journal_rows:
+        journal_rows[name] = []
+    return taken
+
 # deduplication
-queried_matches = load_existing_matches()  # Load past matches from file
-queried_players = set()  # Stores already fetched player IDs
+crawl_index = load_crawl_index()  # Persistent last-fetched times of every match and player
+queried_matches = ClaimSet()  # Match IDs claimed during this run
+queried_players = ClaimSet()  # Player IDs claimed during this run
+recorded_matches = ClaimSet()  # Match IDs whose rows were written during this run
+recorded_players = ClaimSet()  # Player IDs with a leaderboard row written during this run
+in_flight = SingleFlight()  # Concurrent requests of one URL share a single API call
+in_flight_async = AsyncSingleFlight()
 encountered_players = load_existing_players()  # Load previously encountered players for teammates list
-match_players_data = []
-# stat collection
+crawl_checkpoint = CrawlCheckpoint(CHECKPOINT_DIR)
 
-total_scanned_matches = 0
-total_scanned_players = 0
 
+def claim_player(player_id):
+    """Atomically claims a player for this run; False if it was already claimed or refreshed minutes ago by an earlier run."""
+    if crawl_index.fetched_within("player", player_id, PLAYER_REFRESH_SECONDS):
+        return False
+    return queried_players.claim(player_id)
 
 
-def rate_limited_fetch(url):
-    #no need to ratelimit with api key
-    return fetch_data(url)
-    
-    #"""Fetch API data while ensuring global rate limits are not exceeded."""
-    #global request_count, start_time
-
-    #with lock:
-    #    elapsed_time = time.time() - start_time
+def claim_match(match_id):
+    """Atomically claims a match for this run; match payloads never change, so any match in the index is skipped."""
+    if crawl_index.seen("match", match_id):
+        return False
+    return queried_matches.claim(match_id)
 
-        # Reset counter if a minute has passed
-   #     if elapsed_time >= 60:
-   #         request_count = 0
-   #         start_time = time.time()
 
-        # If request limit is reached, wait until reset
-   #     if request_count >= API_LIMIT:
-   #         wait_time = 60 - elapsed_time
-   #         print(f"Rate limit reached! Sleeping for {wait_time:.2f} seconds...")
-   #         time.sleep(wait_time)
-   #         request_count = 0
-   #         start_time = time.time()
 
-   #     request_count += 1
+def rate_limited_fetch(url):
+    """Fetch API data while ensuring the global rate limit is not exceeded.
 
-   # return fetch_data(url)
+    A thread asking for a URL that another thread is already fetching waits for that
+    request and shares its result instead of sending a second one.
+    """
+    data, shared = in_flight.do(url, lambda: fetch_data(url))
+    if shared:
+        metrics.inc("coalesced_requests", endpoint=endpoint_name(url))
+    return data
 
 
 def fetch_data(url, retries=10, delay=2):
     """Fetch JSON data safely, handling rate limits and corrupt responses."""
-    global private_profile_count
+    endpoint = endpoint_name(url)
+    cached = response_cache.lookup(url)
+    if cached is not None and cached.fresh:
+        metrics.inc("cache_hits", endpoint=endpoint)
+        if fixture_recorder is not None:
+            fixture_recorder.record_cached(url, cached.body)
+        return response_cache.decode(cached, endpoint)
 
     for attempt in range(retries):
+        if attempt:
+            metrics.inc("retries", endpoint=endpoint)
         try:
-            
-            response = requests.get(url, headers=headers)
-
-            # Detect Rate Limiting (429 Error)
+            with metrics.timer("limiter_wait_seconds", endpoint=endpoint):
+                rate_limiter.acquire(url)
+            metrics.adjust("requests_in_flight", 1)
+            try:
+                with metrics.timer("request_seconds", endpoint=endpoint):
+                    response = http_session.get(url, headers=dict(headers, **response_cache.conditional_headers(cached)))
+            finally:
+                metrics.adjust("requests_in_flight", -1)
+            rate_limiter.record(url, response.status_code)
+            metrics.inc("responses", endpoint=endpoint, status=response.status_code)
+            if fixture_recorder is not None:
+                fixture_recorder.record(url, response.status_code, response.headers.get("Content-Type"), response.content)
+
+            # Cached copy is still current
+            if response.status_code == 304 and cached is not None:
+                response_cache.refresh(url)
+                if fixture_recorder is not None:
+                    fixture_recorder.record_cached(url, cached.body)
+                return response_cache.decode(cached, endpoint)
+
+            # Detect Rate Limiting (429 Error), pausing every worker at once
             if response.status_code == 429:
-                retry_after = int(response.headers.get("Retry-After", 5))  # Default 5s if not provided
-                print(f"⚠️ Rate limit hit! Sleeping for {retry_after} seconds...")
-                time.sleep(retry_after)
-                continue  # Retry after sleep
+                pause = rate_limiter.throttle(url, response.headers.get("Retry-After"))
+                metrics.inc("throttle_seconds", pause, endpoint=endpoint)
+                print(f"⚠️ Rate limit hit! Pausing all requests for {pause:.1f} seconds...")
+                continue  # Retry once the limiter lets us through
             elif response.status_code == 500:
                 if "player" in url:  # Only count private profiles for player endpoints
                     print(f"Private profile detected: {url}")
-                    private_profile_count += 1
+                    metrics.inc("private_profiles")
                     return None  # Don't retry on 500
                 else:
                     print(f"⚠️ Server error (500) on {url}. Retrying...")
-                    time.sleep(delay)
+                    time.sleep(rate_limiter.backoff(attempt, delay))
                     continue  # Retry instead of skipping
             # Detect API Errors (500, 403, etc.)
             if response.status_code >= 400:
@@ -146,38 +236,88 @@ def fetch_data(url, retries=10, delay=2):
                 print(f"⚠️ Warning: Non-JSON response from {url}. Skipping...")
                 return None
 
-            # Try parsing JSON safely
-            return response.json()
+            # Try parsing JSON safely, keeping only the fields the crawler reads
+            data = loads(response.content, endpoint)
+            response_cache.store(url, response.content, response.headers)
+            return data
 
         except requests.exceptions.RequestException as e:
             print(f"❌ Network error fetching {url}: {e}")
         except ValueError:
             print(f"⚠️ Invalid JSON response from {url}, skipping...")
-        time.sleep(delay)
+        time.sleep(rate_limiter.backoff(attempt, delay))
 
     return None  # If all retries fail
 
 
 
-# Function to append new rows to a CSV file
-def append_csv(filename, fieldnames, data, seen_entries=None):
-    """Appends data to a CSV file but avoids duplicate entries if seen_entries is provided."""
-    if seen_entries is not None:
-        entry_key = (data["timestamp"], data["player_uid"])
-        if entry_key in seen_entries:
-            return  # Skip duplicate
-        seen_entries.add(entry_key)
+# Buffered writers, one per CSV file, shared by every thread and task (opened by open_sinks() when a crawl starts)
+LEADERBOARD_FIELDS = ["timestamp", "rank", "player_name", "rank_name", "score", "matches", "player_id", "rank_score", "is_private"]
+MATCHES_FIELDS = ["match_uid", "replay_id", "gamemode", "match_timestamp", "season", "map_id", "mvp", "svp", "winning_team_score", "losing_team_score"]
+leaderboard_sink = None  # Only when leaderboard.csv is written (LEADERBOARD_STORAGE csv or both)
+matches_sink = None
+
+
+def open_sinks():
+    global leaderboard_sink, matches_sink
+    if leaderboard_storage in ("csv", "both"):
+        leaderboard_sink = CsvSink(LEADERBOARD_FILE, LEADERBOARD_FIELDS)
+    matches_sink = CsvSink(MATCHES_FILE, MATCHES_FIELDS)
+
+
+def active_sinks():
+    return [sink for sink in (leaderboard_sink, matches_sink) if sink is not None]
 
-    file_exists = os.path.isfile(filename)
-    with open(filename, mode="a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(data)
+
+# This run's leaderboard for the snapshot store: player_id -> row, filled in as profiles arrive
+leaderboard_snapshot = {}
+leaderboard_snapshot_timestamp = None
+
+
+def start_leaderboard_snapshot(timestamp, leaderboard):
+    """Seeds the run's snapshot with every leaderboard entry; players whose profile is never read keep unknown fields."""
+    global leaderboard_snapshot_timestamp
+    leaderboard_snapshot_timestamp = timestamp
+    for entry in leaderboard:
+        leaderboard_snapshot[entry["player_id"]] = leaderboard_row(entry["player_id"], timestamp, entry, "NaN", "")
+
+
+def save_leaderboard_snapshot():
+    """Appends the run's leaderboard to the snapshot store (importing leaderboard.csv first if the store is new)."""
+    if leaderboard_storage not in ("snapshots", "both") or not leaderboard_snapshot:
+        return
+    snapshots = LeaderboardSnapshots()
+    if not len(snapshots) and os.path.exists(LEADERBOARD_FILE):
+        imported = migrate_csv(snapshots, LEADERBOARD_FILE, before=leaderboard_snapshot_timestamp)
+        print(f"Imported {imported} leaderboard snapshots from {LEADERBOARD_FILE}.")
+    rows = pd.DataFrame(list(leaderboard_snapshot.values()))
+    if len(snapshots):
+        # Players whose profile was not read this run keep the rank score and privacy of the last snapshot
+        previous = snapshots.latest()
+        player_ids = pd.to_numeric(rows["player_id"], errors="coerce")
+        rows["rank_score"] = pd.to_numeric(rows["rank_score"], errors="coerce")
+        unread = (rows["is_private"] == "") & player_ids.isin(previous.index)
+        for field in ("rank_score", "is_private"):
+            rows.loc[unread, field] = previous.loc[player_ids[unread], field].to_numpy()
+    kind = snapshots.append(leaderboard_snapshot_timestamp, rows)
+    print(f"Saved the leaderboard of {len(leaderboard_snapshot)} players as a {kind} in {LEADERBOARD_SNAPSHOTS_DIR}")
+
+
+def flush_sinks():
+    for sink in active_sinks():
+        sink.flush()
+
+
+def close_sinks():
+    for sink in active_sinks():
+        sink.close()
+    leaderboard_rows = 0 if leaderboard_sink is None else leaderboard_sink.rows_written
+    metrics.inc("rows_written", leaderboard_rows, sink="leaderboard")
+    metrics.inc("rows_written", matches_sink.rows_written, sink="matches")
+    print(f"Wrote {leaderboard_rows} leaderboard rows and {matches_sink.rows_written} match rows.")
 
 # Fetch leaderboard
-def fetch_leaderboard():
-    global total_scanned_matches, total_scanned_players
+def fetch_leaderboard(update_lead=UPDATE_LEAD_SECONDS):
     print("Fetching leaderboard data...")
     leaderboard = rate_limited_fetch(LEADERBOARD_URL)
     if not leaderboard:
@@ -185,6 +325,7 @@ def fetch_leaderboard():
         return
 
     timestamp = datetime.datetime.utcnow().isoformat()
+    start_leaderboard_snapshot(timestamp, leaderboard)
 
     print(f"Processing {len(leaderboard)} players from leaderboard...")
 
@@ -192,61 +333,69 @@ def fetch_leaderboard():
 
     for player in leaderboard:
         player_id = player["player_id"]
-        if player_id not in queried_players:  # Only fetch if not already queried
-            queried_players.add(player_id)
+        if claim_player(player_id):  # Only fetch if not already queried
             players_to_fetch.append((player_id, timestamp, player))
 
     # Fetch all player details in parallel
-    total_scanned_players = total_scanned_players + len(players_to_fetch)
+    metrics.inc("players_scanned", len(players_to_fetch))
+    metrics.gauge("queue_depth", len(players_to_fetch), queue="leaderboard_players")
     print(f"Fetching {len(players_to_fetch)} players")
 
-    fetch_player_details_parallel(players_to_fetch)
+    fetch_player_details_parallel(players_to_fetch, update_lead)
 
 # Fetch match details and save data
 def fetch_match_data(match_id):
     """Fetch match details and save match/player data."""
-    global match_players_data
     match_data = rate_limited_fetch(MATCH_API_URL.format(match_id))
     if not match_data:
         return
+    record_match(match_id, match_data)
 
 
+def record_match(match_id, match_data):
+    """Save match details and queue its players for the match_players files (once per match ever)."""
+    # A match in the index already has its rows (e.g. recorded after the checkpoint a --resume restarts from)
+    if crawl_index.seen("match", match_id) or not recorded_matches.claim(match_id):
+        return
+    crawl_index.mark("match", match_id)
     # Retrieve extra info from match_extra_info if available
     extra = match_extra_info.get(match_id, {})
     print(f"Processing match {match_id}...{extra}")
     # Save match details
-    append_csv(
-        MATCHES_FILE,
-        ["match_uid", "replay_id", "gamemode", "match_timestamp", "season", "map_id", "mvp", "svp", "winning_team_score", "losing_team_score"],
-        {
-            "match_uid": match_data["match_uid"],
-            "replay_id": match_data["replay_id"],
-            "gamemode": match_data["gamemode"]["name"],
-            "match_timestamp": extra.get("match_timestamp", ""),
-            "season": extra.get("season", ""),
-            "map_id": extra.get("map_id", ""),
-            "mvp": match_data["mvp"]["player_uid"],
-            "svp": match_data["svp"]["player_uid"],
-            "winning_team_score": extra.get("winning_team_score", ""),
-            "losing_team_score": extra.get("losing_team_score", ""),   
-        },
-    )
-
-    # Save match players
+    match_row = {
+        "match_uid": match_data["match_uid"],
+        "replay_id": match_data["replay_id"],
+        "gamemode": match_data["gamemode"]["name"],
+        "match_timestamp": extra.get("match_timestamp", ""),
+        "season": extra.get("season", ""),
+        "map_id": extra.get("map_id", ""),
+        "mvp": match_data["mvp"]["player_uid"],
+        "svp": match_data["svp"]["player_uid"],
+        "winning_team_score": extra.get("winning_team_score", ""),
+        "losing_team_score": extra.get("losing_team_score", ""),   
+    }
+    matches_sink.write(match_row)
+
+    # Save match players, and one row per hero each of them played. Each match is
+    # added in one extend() so a flush never splits it between two dataset files
+    # (hero_matrices.py counts a match from the first file that holds it).
+    player_rows, hero_rows = [], []
     for player in match_data["players"]:
-        hero_data = [
-            {
-                "hero_id": hero["hero_id"],
-                "playtime": hero["playtime"]["raw"],
-                "kills": hero["kills"],
-                "deaths": hero["deaths"],
-                "assists": hero["assists"],
-                "hit_rate": hero["hit_rate"],
-            }
-            for hero in player.get("heroes", [])
-        ]
-        hero_data_str = json.dumps(hero_data, separators=(',', ':'))
-        match_players_data.append(
+        for hero in player.get("heroes", []):
+            hero_rows.append(
+                {
+                    "match_uid": match_data["match_uid"],
+                    "player_uid": player["player_uid"],
+                    "hero_id": hero["hero_id"],
+                    "playtime": hero["playtime"]["raw"],
+                    "kills": hero["kills"],
+                    "deaths": hero["deaths"],
+                    "assists": hero["assists"],
+                    "hit_rate": hero["hit_rate"],
+                    "match_timestamp": extra.get("match_timestamp", "")
+                }
+            )
+        player_rows.append(
             {
                 "match_uid": match_data["match_uid"],
                 "player_uid": player["player_uid"],
@@ -259,18 +408,29 @@ def fetch_match_data(match_id):
                 "hero_damage": player["hero_damage"],
                 "hero_healed": player["hero_healed"],
                 "damage_taken": player["damage_taken"],
-                "hero_data": f'"{hero_data_str}"',
                 "match_timestamp": extra.get("match_timestamp", "") 
             },
         )
+    match_player_heroes_data.extend(hero_rows)
+    match_players_data.extend(player_rows)
+    if journal_rows is not None:
+        journal_rows["matches"].append(match_row)
+        journal_rows["match_players"].extend(player_rows)
+        journal_rows["match_player_heroes"].extend(hero_rows)
 
 
 # Parallel fetching of player details
-def fetch_player_details_parallel(players_to_fetch):
-
-    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS) as executor:
+def fetch_player_details_parallel(players_to_fetch, update_lead=UPDATE_LEAD_SECONDS):
+    """Reads every player's profile, with the player-update triggers pipelined ahead of the reads.
+
+    The triggers run on their own workers in leaderboard order, so by the time a
+    profile is read its update has usually been sent well over update_lead seconds ago.
+    """
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS) as update_executor, \
+            ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS) as executor:
+        updates = {player_id: update_executor.submit(trigger_player_update, player_id) for player_id, _, _ in players_to_fetch}
         future_to_player = {
-            executor.submit(fetch_and_process_player, player_id, timestamp, player_data): player_id
+            executor.submit(fetch_and_process_player, player_id, timestamp, player_data, updates[player_id], update_lead): player_id
             for player_id, timestamp, player_data in players_to_fetch
         }
 
@@ -283,48 +443,74 @@ def fetch_player_details_parallel(players_to_fetch):
 
 
 
-# Fetch and process a single player's data
-def fetch_and_process_player(player_id, timestamp, leaderboard_entry):
-     # Trigger player update
+def trigger_player_update(player_id):
+    """Asks the API to refresh a player; returns the time.monotonic() at which the trigger finished."""
     rate_limited_fetch(PLAYER_UPDATE_URL.format(player_id))
-    
+    return time.monotonic()
+
+
+# Fetch and process a single player's data
+def fetch_and_process_player(player_id, timestamp, leaderboard_entry, update, update_lead=UPDATE_LEAD_SECONDS):
+    # Wait for the player's update trigger (sent ahead by the update workers) plus the lead time
+    try:
+        updated_at = update.result()
+    except Exception as e:
+        print(f"Error triggering update of player {player_id}: {e}")
+        updated_at = time.monotonic()
+    time.sleep(max(0.0, updated_at + update_lead - time.monotonic()))
+
     player_data = rate_limited_fetch(PLAYER_API_URL.format(player_id))
-    
+    record_leaderboard_player(player_id, timestamp, leaderboard_entry, player_data)
+
+    # Process encountered players (teammates + match opponents)
+    process_encountered_players(player_data, timestamp)
+
+
+def record_leaderboard_player(player_id, timestamp, leaderboard_entry, player_data):
+    """Save a leaderboard row for a player (once per run), logging private profiles as well."""
+    if not recorded_players.claim(player_id):
+        return
+    crawl_index.mark("player", player_id)
     is_private = player_data is None or player_data.get("is_profile_private", True)
 
     
     # Use R-friendly nil values
     rank_score = "NaN" if is_private else player_data["stats"]["rank"]["score"]
-    player_name = "" if leaderboard_entry["player_name"] is None else leaderboard_entry["player_name"]
-    rank_name = "" if leaderboard_entry["rank_name"] is None else leaderboard_entry["rank_name"]
+    row = leaderboard_row(player_id, timestamp, leaderboard_entry, rank_score, "Yes" if is_private else "No")
 
     # Save leaderboard data, ensuring private profiles are logged
-    append_csv(
-        LEADERBOARD_FILE,
-        ["timestamp", "rank", "player_name", "rank_name", "score", "matches", "player_id", "rank_score", "is_private"],
-        {
-            "timestamp": timestamp,
-            "rank": leaderboard_entry["rank"],
-            "player_name": player_name,
-            "rank_name": rank_name,
-            "score": leaderboard_entry["score"],
-            "matches": leaderboard_entry["matches"],
-            "player_id": player_id,
-            "rank_score": rank_score,  # N/A if private
-            "is_private": "Yes" if is_private else "No"
-        },
-    )
+    if leaderboard_sink is not None:
+        leaderboard_sink.write(row)
+    if timestamp == leaderboard_snapshot_timestamp:  # Not for reads left over from a resumed run
+        leaderboard_snapshot[player_id] = row
 
-    # Process encountered players (teammates + match opponents)
-    process_encountered_players(player_data, timestamp)
+
+def leaderboard_row(player_id, timestamp, leaderboard_entry, rank_score, is_private):
+    return {
+        "timestamp": timestamp,
+        "rank": leaderboard_entry["rank"],
+        "player_name": "" if leaderboard_entry["player_name"] is None else leaderboard_entry["player_name"],
+        "rank_name": "" if leaderboard_entry["rank_name"] is None else leaderboard_entry["rank_name"],
+        "score": leaderboard_entry["score"],
+        "matches": leaderboard_entry["matches"],
+        "player_id": player_id,
+        "rank_score": rank_score,  # N/A if private
+        "is_private": is_private,
+    }
 
 
 
 # Process teammates and match history
 def process_encountered_players(player_data, timestamp):
-    global total_scanned_matches, total_scanned_players
-    if player_data.get("is_profile_private", True):
-        return
+    players_to_fetch, matches_to_fetch = collect_encountered_players(player_data, timestamp)
+    fetch_teammates_parallel(players_to_fetch)
+    fetch_matches_parallel(matches_to_fetch)
+
+
+def collect_encountered_players(player_data, timestamp):
+    """Return the not yet queried teammates and matches of a public profile."""
+    if player_data is None or player_data.get("is_profile_private", True):
+        return [], []
 
     players_to_fetch = []
     matches_to_fetch = []
@@ -332,16 +518,14 @@ def process_encountered_players(player_data, timestamp):
     # Process teammates
     if "teammates" in player_data:
         for teammate in player_data["teammates"]:
-            if teammate["player_uid"] not in queried_players:  # Avoid duplicate queries
-                queried_players.add(teammate["player_uid"])
+            if claim_player(teammate["player_uid"]):  # Avoid duplicate queries
                 players_to_fetch.append((teammate["player_uid"], timestamp))
 
     # Process match history (only fetch unique matches)
     if "match_history" in player_data:
         for match in player_data["match_history"]:
             match_id = match["match_uid"]
-            if match_id not in queried_matches:
-                queried_matches.add(match_id)
+            if claim_match(match_id):
                 matches_to_fetch.append(match_id)
             
             if match_id not in match_extra_info:
@@ -349,21 +533,20 @@ def process_encountered_players(player_data, timestamp):
                 score = match.get("score", {})
                 winning_score = score.get("ally") if is_win else score.get("enemy")
                 losing_score = score.get("enemy") if is_win else score.get("ally")
-                match_extra_info[match_id] = {
+                # setdefault: whichever thread gets here first keeps its entry
+                match_extra_info.setdefault(match_id, {
                 "match_timestamp": match.get("match_timestamp", ""),
                 "season": match.get("season", ""),
                 "map_id": match.get("match_map", {}).get("id", ""),
                 "winning_team_score": winning_score,
                 "losing_team_score": losing_score,   
-            }
+            })
 
     # Fetch teammates and matches in parallel
-    total_scanned_matches = total_scanned_matches + len(matches_to_fetch)
-    total_scanned_players = total_scanned_players + len(players_to_fetch)
-    print(f"Fetching {len(players_to_fetch)} encountered players for a total of {total_scanned_players} and {len(matches_to_fetch)} encountered matches for a total of {total_scanned_matches}")
-    
-    fetch_teammates_parallel(players_to_fetch)
-    fetch_matches_parallel(matches_to_fetch)
+    metrics.inc("matches_scanned", len(matches_to_fetch))
+    metrics.inc("players_scanned", len(players_to_fetch))
+    print(f"Fetching {len(players_to_fetch)} encountered players for a total of {metrics.value('players_scanned')} and {len(matches_to_fetch)} encountered matches for a total of {metrics.value('matches_scanned')}")
+    return players_to_fetch, matches_to_fetch
 
 
 # Fetch teammates' details in parallel
@@ -385,26 +568,19 @@ def fetch_teammates_parallel(players_to_fetch):
                 print(f"Error processing encountered player {player_id}: {e}")
 
 def save_encountered_players():
-    """Saves all encountered players to CSV (no duplicates)."""
-    with open(PLAYER_ENCOUNTERS_FILE, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["player_uid", "player_name", "highest_score", "latest_score", "matches", "wins"])
-        writer.writeheader()
-        for player_uid, data in encountered_players.items():
-            writer.writerow({
-                "player_uid": player_uid,
-                "player_name": data["player_name"],
-                "highest_score": data["highest_score"],
-                "latest_score": data["latest_score"],
-                "matches": data["matches"],
-                "wins": data["wins"]
-            })
+    """Appends the encountered players changed during this run to the registry."""
+    return encountered_players.save()
 
 
 # Fetch and process a single teammate's data
 def fetch_and_process_teammate(player_id):
-    global encountered_players
     player_data = rate_limited_fetch(PLAYER_API_URL.format(player_id))
+    record_teammate(player_id, player_data)
+
 
+def record_teammate(player_id, player_data):
+    """Update the encountered player registry from a teammate's profile."""
+    crawl_index.mark("player", player_id)
     is_private = player_data is None or player_data.get("is_profile_private", True)
 
     if is_private or player_data is None:
@@ -417,24 +593,8 @@ def fetch_and_process_teammate(player_id):
     player_name = player_data["player_name"]
 
     print(f"Processing encountered player {player_id} - {'PRIVATE' if is_private else 'PUBLIC'} profile...")
-    with encountered_lock:
-        # Check if the player already exists
-        if player_id in encountered_players:
-            encountered_players[player_id]["latest_score"] = latest_score
-            encountered_players[player_id]["matches"] = matches
-            encountered_players[player_id]["wins"] = wins
-            # Update highest score if this is a new record
-            if latest_score != 0 and latest_score > encountered_players[player_id]["highest_score"]:
-                encountered_players[player_id]["highest_score"] = latest_score
-        else:
-            # Add new player
-            encountered_players[player_id] = {
-                "player_name": player_name,
-                "highest_score": latest_score,
-                "latest_score": latest_score,
-                "matches": matches,
-                "wins": wins
-            }
+    # Adds the player or updates their scores (the highest score only goes up)
+    encountered_players.record(player_id, player_name, latest_score, matches, wins)
 
 # Fetch matches in parallel (avoiding duplicates)
 def fetch_matches_parallel(matches_to_fetch):
@@ -454,54 +614,371 @@ def fetch_matches_parallel(matches_to_fetch):
             except Exception as e:
                 print(f"Error processing match {match_id}: {e}")
 
-def save_to_disk():
-    """Writes all collected data to files in one batch."""
-    df = pd.DataFrame(match_players_data)
-    if "match_timestamp" not in df.columns or df.empty:
-        print("No match_timestamp data found in match_players_data!")
-        return
-    # Convert the match_timestamp column to datetime
-    df['match_timestamp'] = pd.to_datetime(df['match_timestamp'], errors='coerce', unit='s')
-     # Separate rows with valid and invalid timestamps
-    valid_df = df.dropna(subset=['match_timestamp'])
-    default_df = df[df['match_timestamp'].isna()]
-
-    # Ensure the directory exists
-    os.makedirs(MATCH_PLAYERS_FILE, exist_ok=True)
-    if not valid_df.empty:
-        # Create week and year columns using ISO calendar
-        df['week'] = df['match_timestamp'].dt.isocalendar().week
-        df['year'] = df['match_timestamp'].dt.year
-
-        # Group the DataFrame by year and week, then save each group separately
-        for (year, week), group in df.groupby(['year', 'week']):
-            filename = os.path.join(MATCH_PLAYERS_FILE, f"match_players_week_{week}_{year}.parquet")
-            print(f"Saving group for week {week} of {year} to {filename}...")
-            if os.path.exists(filename):
-                old_data = pd.read_parquet(filename, engine="pyarrow")
-                combined_group = pd.concat([old_data, group])
-                combined_group.drop_duplicates(subset=["match_uid", "player_uid"], keep="last", inplace=True)
-                combined_group.to_parquet(filename, index=False, engine="pyarrow")
-            else:
-                group.to_parquet(filename, index=False, engine="pyarrow")
-    if not default_df.empty:
-        default_filename = os.path.join(MATCH_PLAYERS_FILE, "match_players_default.parquet")
-        print(f"Saving rows with missing timestamps to {default_filename}...")
-        if os.path.exists(default_filename):
-            old_data = pd.read_parquet(default_filename, engine="pyarrow")
-            combined_default = pd.concat([old_data, default_df])
-            combined_default.drop_duplicates(subset=["match_uid", "player_uid"], keep="last", inplace=True)
-            combined_default.to_parquet(default_filename, index=False, engine="pyarrow")
+# ---------------------------
+# Asynchronous crawler
+# ---------------------------
+async def rate_limited_fetch_async(session, url):
+    """Like rate_limited_fetch: tasks asking for a URL that is already being fetched share that request."""
+    data, shared = await in_flight_async.do(url, lambda: fetch_data_async(session, url))
+    if shared:
+        metrics.inc("coalesced_requests", endpoint=endpoint_name(url))
+    return data
+
+
+async def fetch_data_async(session, url, retries=10, delay=2):
+    """Fetch JSON data through the shared aiohttp session, handling rate limits and corrupt responses."""
+    endpoint = endpoint_name(url)
+    cached = response_cache.lookup(url)
+    if cached is not None and cached.fresh:
+        metrics.inc("cache_hits", endpoint=endpoint)
+        if fixture_recorder is not None:
+            fixture_recorder.record_cached(url, cached.body)
+        return response_cache.decode(cached, endpoint)
+
+    for attempt in range(retries):
+        if attempt:
+            metrics.inc("retries", endpoint=endpoint)
+        try:
+            with metrics.timer("limiter_wait_seconds", endpoint=endpoint):
+                await rate_limiter.acquire_async(url)
+            metrics.adjust("requests_in_flight", 1)
+            request_started = time.monotonic()
+            try:
+                response = await session.get(url, headers=response_cache.conditional_headers(cached))
+            finally:
+                metrics.adjust("requests_in_flight", -1)
+                metrics.observe("request_seconds", time.monotonic() - request_started, endpoint=endpoint)
+            async with response:
+                rate_limiter.record(url, response.status)
+                metrics.inc("responses", endpoint=endpoint, status=response.status)
+                if fixture_recorder is not None:
+                    fixture_recorder.record(url, response.status, response.headers.get("Content-Type"), await response.read())
+
+                # Cached copy is still current
+                if response.status == 304 and cached is not None:
+                    response_cache.refresh(url)
+                    if fixture_recorder is not None:
+                        fixture_recorder.record_cached(url, cached.body)
+                    return response_cache.decode(cached, endpoint)
+
+                # Detect Rate Limiting (429 Error), pausing every worker at once
+                if response.status == 429:
+                    pause = rate_limiter.throttle(url, response.headers.get("Retry-After"))
+                    metrics.inc("throttle_seconds", pause, endpoint=endpoint)
+                    print(f"⚠️ Rate limit hit! Pausing all requests for {pause:.1f} seconds...")
+                    continue  # Retry once the limiter lets us through
+                elif response.status == 500:
+                    if "player" in url:  # Only count private profiles for player endpoints
+                        print(f"Private profile detected: {url}")
+                        metrics.inc("private_profiles")
+                        return None  # Don't retry on 500
+                    else:
+                        print(f"⚠️ Server error (500) on {url}. Retrying...")
+                        await asyncio.sleep(rate_limiter.backoff(attempt, delay))
+                        continue  # Retry instead of skipping
+                # Detect API Errors (500, 403, etc.)
+                if response.status >= 400:
+                    print(f"⚠️ API Error {response.status}: Skipping {url}")
+                    return None
+
+                # Detect Non-JSON Responses
+                content_type = response.headers.get("Content-Type", "")
+                if "application/json" not in content_type:
+                    print(f"⚠️ Warning: Non-JSON response from {url}. Skipping...")
+                    return None
+
+                body = await response.read()
+                data = loads(body, endpoint)
+                response_cache.store(url, body, response.headers)
+                return data
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"❌ Network error fetching {url}: {e}")
+        except ValueError:
+            print(f"⚠️ Invalid JSON response from {url}, skipping...")
+        await asyncio.sleep(rate_limiter.backoff(attempt, delay))
+
+    return None  # If all retries fail
+
+
+async def process_item(session, frontier, priority, kind, uid, context, update_lead=UPDATE_LEAD_SECONDS):
+    """Fetch one frontier item and push whatever it discovers back onto the frontier."""
+    try:
+        if kind == "update":
+            # Trigger player update, then queue the profile read once the refresh had update_lead seconds
+            try:
+                await rate_limited_fetch_async(session, PLAYER_UPDATE_URL.format(uid))
+            finally:
+                frontier.push_player("player", uid, priority, context, not_before=time.time() + update_lead)
+        elif kind == "player":
+            timestamp, leaderboard_entry = context
+            player_data = await rate_limited_fetch_async(session, PLAYER_API_URL.format(uid))
+            record_leaderboard_player(uid, timestamp, leaderboard_entry, player_data)
+            players_to_fetch, matches_to_fetch = collect_encountered_players(player_data, timestamp)
+            for teammate_id, _ in players_to_fetch:
+                known = encountered_players.get(teammate_id, {})
+                last_seen = crawl_index.last_fetched("player", teammate_id)
+                frontier.push_player("teammate", teammate_id, player_priority(score=known.get("latest_score"), last_seen=last_seen))
+            for match_id in matches_to_fetch:
+                match_timestamp = match_extra_info.get(match_id, {}).get("match_timestamp")
+                frontier.push_match(match_id, match_priority(priority, match_timestamp))
+        elif kind == "teammate":
+            player_data = await rate_limited_fetch_async(session, PLAYER_API_URL.format(uid))
+            record_teammate(uid, player_data)
+        elif kind == "match":
+            match_data = await rate_limited_fetch_async(session, MATCH_API_URL.format(uid))
+            if match_data:
+                record_match(uid, match_data)
+    except Exception as e:
+        print(f"Error processing {kind} {uid}: {e}")
+
+
+async def run_frontier(session, frontier, budget, concurrency, update_lead=UPDATE_LEAD_SECONDS, update_window=UPDATE_WINDOW):
+    """Keep up to `concurrency` of the most valuable frontier items in flight until the frontier or budget runs out.
+
+    Player-update triggers are pipelined ahead of the profile reads: a read becomes
+    available update_lead seconds after its trigger, other work fills the gap, and
+    no more than update_window triggered players wait for their read at a time.
+    """
+    in_flight = {}
+    last_checkpoint = time.monotonic()
+    while True:
+        while len(in_flight) < concurrency and not budget.exhausted():
+            updates_ahead = len(frontier.delayed) + sum(1 for item in in_flight.values() if item[1] == "update")
+            item = frontier.pop(include_updates=updates_ahead < max(update_window, 1))
+            if item is None:
+                break
+            budget.spend()
+            in_flight[asyncio.create_task(process_item(session, frontier, *item, update_lead=update_lead))] = item
+        metrics.gauge("queue_depth", len(frontier), queue="frontier")
+        metrics.gauge("queue_depth", len(in_flight), queue="in_flight")
+        metrics.gauge("queue_depth", len(frontier.delayed), queue="awaiting_read")
+        next_due = frontier.next_due()
+        if not in_flight:
+            if not frontier or budget.exhausted():
+                break
+            # Nothing could be started above: sleep until the next read is due (unless next_due() just released some)
+            if next_due is not None:
+                await asyncio.sleep(max(0.0, next_due - time.time()))
+            continue
+        # Wake up for the next read that becomes due, even if nothing finished by then, but only if
+        # a slot would be free to start it; otherwise (even if it is overdue) wait for a task to finish
+        can_start = len(in_flight) < concurrency and not budget.exhausted()
+        timeout = None if next_due is None or not can_start else max(0.0, next_due - time.time())
+        done, _ = await asyncio.wait(in_flight, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            del in_flight[task]
+
+        if time.monotonic() - last_checkpoint >= CHECKPOINT_INTERVAL:
+            write_checkpoint(frontier, in_flight.values())
+            last_checkpoint = time.monotonic()
+
+    if frontier:
+        print(f"⏳ Crawl budget exhausted ({budget}), leaving {len(frontier) - len(frontier.matches)} players and {len(frontier.matches)} matches unvisited.")
+
+
+def write_checkpoint(frontier, in_flight=()):
+    """Journal the crawl state so that --resume can continue from here."""
+    with metrics.timer("stage_seconds", stage="checkpoint"):
+        flush_sinks()
+        # Rows go straight to data/, and are journaled too until data/ is committed
+        # (a crash before state.json is replaced only re-fetches matches; compact drops duplicates)
+        save_to_disk()
+        state = {
+            # Items still in flight are saved as pending, they get fetched again on resume
+            "frontier": list(in_flight) + frontier.pending(),
+            # Only the players changed since the registry was loaded
+            "encountered_players": encountered_players.changes(),
+            "match_extra_info": match_extra_info,
+            "total_scanned_players": metrics.value("players_scanned"),
+            "total_scanned_matches": metrics.value("matches_scanned"),
+            "private_profile_count": metrics.value("private_profiles"),
+        }
+        crawl_checkpoint.save(state, **take_journal_rows())
+        # Only now that their rows are saved may the matches marked since the last checkpoint count as done
+        crawl_index.commit()
+    write_metrics()
+    print(f"💾 Checkpoint: {len(state['frontier'])} pending items, {match_players_data.rows_flushed} match player rows saved.")
+
+
+def restore_checkpoint(frontier):
+    """Reload the state of the last checkpoint and re-queue its pending items."""
+    saved = {}
+
+    def unsaved(name, row):
+        # The index is committed with data/, so a match in it has its rows in data/ for good
+        match_id = row["match_uid"]
+        if match_id not in saved:
+            saved[match_id] = crawl_index.seen("match", match_id)
+        return not saved[match_id]
+
+    state, journals = crawl_checkpoint.load(keep=unsaved)
+    # What is left are rows of runs whose data/ was never committed (e.g. the run failed): write them again
+    for row in journals.get("matches", []):
+        matches_sink.write(row)
+    rows = journals.get("match_players", [])
+    match_players_data.extend(rows)
+    match_player_heroes_data.extend(journals.get("match_player_heroes", []))
+    restored = {row["match_uid"] for journal in journals.values() for row in journal}
+    for match_id in restored:
+        queried_matches.claim(match_id)
+        recorded_matches.claim(match_id)
+    crawl_index.mark_many("match", restored)
+    encountered_players.apply(state["encountered_players"])
+    match_extra_info.update(state["match_extra_info"])
+    metrics.inc("players_scanned", state["total_scanned_players"])
+    metrics.inc("matches_scanned", state["total_scanned_matches"])
+    metrics.inc("private_profiles", state["private_profile_count"])
+    skipped = 0
+    for priority, kind, uid, context in state["frontier"]:
+        if kind == "match":
+            # Matches recorded after the checkpoint was written are done already
+            if not claim_match(uid):
+                skipped += 1
+                continue
+            frontier.push_match(uid, priority, context)
         else:
-            default_df.to_parquet(default_filename, index=False, engine="pyarrow")
+            queried_players.add(uid)
+            frontier.push_player(kind, uid, priority, context)
+    print(f"♻️ Resuming from checkpoint: {len(frontier)} pending items ({skipped} matches already recorded), "
+          f"{len(rows)} match player rows of {len(restored)} unsaved matches.")
+
+
+def write_metrics():
+    metrics.write(rate_limiter=rate_limiter.summary(), response_cache=response_cache.summary())
+
+
+def finish_checkpoint(frontier):
+    """After the outputs are saved, keep only the unvisited frontier and the row journals for the next run.
+
+    The journals keep this run's rows until a --resume finds them in the index
+    committed with data/ (if the workflow fails before committing, they are written again).
+    """
+    rows = take_journal_rows()
+    if not frontier and not crawl_checkpoint.journal_rows() and not any(rows.values()):
+        crawl_checkpoint.clear()
+        return
+    match_extra_info_pending = {uid: match_extra_info[uid] for _, kind, uid, _ in frontier.pending()
+                                if kind == "match" and uid in match_extra_info}
+    crawl_checkpoint.save({
+        "frontier": frontier.pending(),
+        "encountered_players": {},
+        "match_extra_info": match_extra_info_pending,
+        "total_scanned_players": 0,
+        "total_scanned_matches": 0,
+        "private_profile_count": 0,
+    }, **rows)
+
+
+async def crawl_async(concurrency=ASYNC_CONCURRENCY, budget=None, resume=False,
+                      update_lead=UPDATE_LEAD_SECONDS, update_window=UPDATE_WINDOW):
+    """Crawl leaderboard players, teammates and matches on one event loop and one connection pool.
+
+    Work is scheduled from a priority frontier so that, when `budget` runs out, the
+    most valuable players and matches have been fetched first. With `resume`, the
+    frontier and in-memory state of the last checkpoint are restored first.
+    Returns the frontier with whatever was left unvisited.
+    """
+    budget = budget or CrawlBudget()
+    frontier = Frontier()
+    start_journal()
+    if resume and crawl_checkpoint.exists():
+        restore_checkpoint(frontier)
+
+    connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(headers=headers, connector=connector, timeout=timeout) as session:
+        print("Fetching leaderboard data...")
+        budget.spend()
+        leaderboard = await rate_limited_fetch_async(session, LEADERBOARD_URL)
+        if not leaderboard:
+            print("Failed to fetch leaderboard.")
+            leaderboard = []
+
+        timestamp = datetime.datetime.utcnow().isoformat()
+        start_leaderboard_snapshot(timestamp, leaderboard)
+        print(f"Processing {len(leaderboard)} players from leaderboard...")
+
+        players_to_fetch = 0
+        for player in leaderboard:
+            player_id = player["player_id"]
+            if claim_player(player_id):  # Only fetch if not already queried
+                known = encountered_players.get(player_id, {})
+                last_seen = crawl_index.last_fetched("player", player_id)
+                priority = player_priority(rank=player["rank"], score=known.get("latest_score", player["score"]), last_seen=last_seen)
+                frontier.push_player("update", player_id, priority, (timestamp, player))
+                players_to_fetch += 1
+        metrics.inc("players_scanned", players_to_fetch)
+        print(f"Fetching {players_to_fetch} players")
+
+        await run_frontier(session, frontier, budget, concurrency, update_lead, update_window)
+    return frontier
+
+
+def save_to_disk():
+    """Appends the match players and per-hero rows still in memory to the partitioned datasets."""
+    if not match_players_data.flush():
+        print("No new match player rows to save.")
+    match_player_heroes_data.flush()
 
 
 if __name__ == "__main__":
-    fetch_leaderboard()
-    print(f"Saving {len(encountered_players)} encountered players to CSV...")
-    save_encountered_players()
-    save_to_disk()
+    parser = argparse.ArgumentParser(description="Crawl the mrapi.org leaderboard, its players and their matches.")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="crawl on a single asyncio event loop with one shared connection pool")
+    parser.add_argument("--concurrency", type=int, default=ASYNC_CONCURRENCY,
+                        help=f"max in-flight requests in --async mode (default {ASYNC_CONCURRENCY})")
+    parser.add_argument("--rate-limit", type=int, default=API_LIMIT,
+                        help=f"API calls per minute shared by all workers (default {API_LIMIT})")
+    parser.add_argument("--budget-requests", type=int, default=None,
+                        help="stop scheduling new work after this many requests (--async mode)")
+    parser.add_argument("--budget-minutes", type=float, default=None,
+                        help="stop scheduling new work after this many minutes (--async mode)")
+    parser.add_argument("--resume", action="store_true",
+                        help=f"continue from the checkpoint in {CHECKPOINT_DIR} if there is one (implies --async)")
+    parser.add_argument("--update-lead", type=float, default=UPDATE_LEAD_SECONDS,
+                        help=f"seconds between a player-update trigger and the profile read (default {UPDATE_LEAD_SECONDS})")
+    parser.add_argument("--update-window", type=int, default=UPDATE_WINDOW,
+                        help=f"max players triggered ahead of their profile read in --async mode (default {UPDATE_WINDOW})")
+    parser.add_argument("--metrics-file", default=METRICS_FILE,
+                        help=f"JSON summary of counters, queue depths and latencies (default {METRICS_FILE})")
+    parser.add_argument("--prometheus-file", default=None,
+                        help="also write the metrics in Prometheus text format to this file")
+    args = parser.parse_args()
+    rate_limiter = RateLimiter(args.rate_limit)
+    metrics.metrics_file = args.metrics_file
+    metrics.prometheus_file = args.prometheus_file
+
+    open_sinks()
+    frontier = None
+    with metrics.timer("stage_seconds", stage="crawl"):
+        if args.use_async or args.resume:
+            budget_seconds = None if args.budget_minutes is None else args.budget_minutes * 60
+            budget = CrawlBudget(args.budget_requests, budget_seconds)
+            frontier = asyncio.run(crawl_async(args.concurrency, budget, resume=args.resume,
+                                               update_lead=args.update_lead, update_window=args.update_window))
+        else:
+            fetch_leaderboard(args.update_lead)
+    with metrics.timer("stage_seconds", stage="close_sinks"):
+        close_sinks()
+    with metrics.timer("stage_seconds", stage="save_leaderboard_snapshot"):
+        save_leaderboard_snapshot()
+    with metrics.timer("stage_seconds", stage="save_encountered_players"):
+        changed_players = save_encountered_players()
+    print(f"Saved {changed_players} changed of {len(encountered_players)} encountered players to {PLAYER_REGISTRY_DIR}")
+    with metrics.timer("stage_seconds", stage="save_to_disk"):
+        save_to_disk()
+    if frontier is not None:
+        finish_checkpoint(frontier)
+    crawl_index.close()
+    response_cache.close()
+    if fixture_recorder is not None:
+        fixture_recorder.close()
+    write_metrics()
     print("Data collection completed!")
-    print(f"Total Players Scanned: {total_scanned_players}")
-    print(f"Total Matches Scanned: {total_scanned_matches}")
-    print(f"Private Profiles Encountered: {private_profile_count}")
+    print(f"Total Players Scanned: {metrics.value('players_scanned')}")
+    print(f"Total Matches Scanned: {metrics.value('matches_scanned')}")
+    print(f"Private Profiles Encountered: {metrics.value('private_profiles')}")
+    rate_limiter.print_summary()
+    response_cache.print_summary()
+    print(f"📈 Metrics written to {args.metrics_file}")
@@ -0,0 +1,265 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections import defaultdict
+from urllib.parse import urlparse
+
+# Set MRAPI_RECORD to a fixture file to record every API response the scripts receive.
+# Replay them with `python api_fixtures.py serve <file>` and MRAPI_BASE_URL=http://127.0.0.1:8765/api/
+FIXTURE_RECORD_FILE = os.getenv("MRAPI_RECORD")
+DEFAULT_PORT = 8765
+COMMIT_EVERY = 500  # Recorded responses before they are committed to disk
+HERO_IDS = [1011, 1014, 1015, 1016, 1017, 1018, 1020, 1021, 1022, 1023, 1024, 1025]
+
+
+def fixture_key(url):
+    """Returns the API path of a URL, e.g. 'player/123' for https://mrapi.org/api/player/123."""
+    path = urlparse(url).path.strip("/")
+    if path.startswith("api/"):
+        path = path[len("api/"):]
+    return path
+
+
+class FixtureStore:
+    """zlib-compressed API responses keyed by API path, in one SQLite file.
+
+    Only the path after /api/ is stored, so fixtures recorded against mrapi.org
+    replay from any base URL. Safe to share between threads.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS fixtures ("
+            " key TEXT PRIMARY KEY,"
+            " status INTEGER NOT NULL,"
+            " content_type TEXT,"
+            " body BLOB NOT NULL"
+            ")"
+        )
+        self.conn.commit()
+        self.pending = 0
+
+    def record(self, url, status, content_type, body):
+        """Stores one response (body as bytes); a later response for the same path replaces it."""
+        if status < 200 or status in (304, 429):
+            # Not a final answer: rate limiting is injected by the stub server, and a 304
+            # has no body (record_cached() stores the cached payload it confirms instead)
+            return
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO fixtures (key, status, content_type, body) VALUES (?, ?, ?, ?)",
+                (fixture_key(url), status, content_type, zlib.compress(body)),
+            )
+            self.pending += 1
+            if self.pending >= COMMIT_EVERY:
+                self.conn.commit()
+                self.pending = 0
+
+    def record_cached(self, url, body):
+        """Stores a payload served from the response cache as the 200 response it came from."""
+        self.record(url, 200, "application/json", body)
+
+    def get(self, key):
+        """Returns (status, content_type, body bytes) for an API path, or None."""
+        with self.lock:
+            row = self.conn.execute("SELECT status, content_type, body FROM fixtures WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        status, content_type, body = row
+        return status, content_type, zlib.decompress(body)
+
+    def counts(self):
+        """Returns {endpoint: number of fixtures}."""
+        counts = defaultdict(int)
+        with self.lock:
+            for (key,) in self.conn.execute("SELECT key FROM fixtures"):
+                counts[key.split("/")[0]] += 1
+        return dict(counts)
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+
+def open_recorder():
+    """The FixtureStore named by MRAPI_RECORD, or None when recording is off."""
+    return FixtureStore(FIXTURE_RECORD_FILE) if FIXTURE_RECORD_FILE else None
+
+
+# ---------------------------
+# Synthetic fixtures
+# ---------------------------
+def _synthetic_player(rng, uid, match_ids, player_ids, now):
+    history = []
+    for match_uid in rng.sample(match_ids, min(len(match_ids), 10)):
+        history.append({
+            "match_uid": match_uid,
+            "match_timestamp": now - rng.randint(0, 14 * 86400),
+            "season": 3,
+            "match_map": {"id": 1272},
+            "score": {"ally": 2, "enemy": rng.randint(0, 2)},
+            "stats": {"is_win": rng.random() < 0.5, "kills": rng.randint(0, 30), "deaths": rng.randint(0, 20),
+                      "assists": rng.randint(0, 30), "hero": {"id": rng.choice(HERO_IDS)}, "has_escaped": False},
+            "match_duration": {"raw": rng.randint(300, 1500)},
+            "winner_side": rng.randint(0, 1),
+            "mvp_uid": str(rng.choice(player_ids)),
+            "svp_uid": str(rng.choice(player_ids)),
+            "gamemode": {"id": 2},
+        })
+    mode_stats = {"total_assists": 300, "total_deaths": 200, "total_kills": 400, "total_time_played": "40h 3m 2s",
+                  "total_matches": 150, "total_wins": 80}
+    return {
+        "player_name": f"player{uid}",
+        "player_uid": str(uid),
+        "is_profile_private": False,
+        "stats": {"rank": {"score": rng.randint(3000, 5500)}, "total_matches": 300, "total_wins": 160,
+                  "ranked": mode_stats, "unranked": mode_stats},
+        "hero_stats": {str(hero_id): {"ranked": {"matches": rng.randint(1, 100), "wins": rng.randint(0, 60), "mvp": 3, "svp": 2,
+                                                 "kills": 400, "deaths": 200, "assists": 300, "damage_given": 250000.5,
+                                                 "damage_received": 200000.5, "heal": 1000.0, "playtime": "12h 5m 3s"},
+                                      "matchup": {"matches": 20, "wins": 11}}
+                       for hero_id in rng.sample(HERO_IDS, 4)},
+        "teammates": [{"player_uid": str(rng.choice(player_ids)), "stats": {"matches": 3, "wins": 2}} for _ in range(5)],
+        "match_history": history,
+        "rank_history": [{"timestamp": now - i * 86400, "rank": {"old_level": 20, "new_level": 21, "old_score": 4000, "new_score": 4030}}
+                         for i in range(5)],
+    }
+
+
+def _synthetic_match(rng, match_uid, player_ids):
+    players = []
+    for team in (0, 1):
+        for uid in rng.sample(player_ids, 6):
+            heroes = [{"hero_id": hero_id, "playtime": {"raw": rng.uniform(60, 900)}, "kills": rng.randint(0, 15),
+                       "deaths": rng.randint(0, 10), "assists": rng.randint(0, 15), "hit_rate": rng.random()}
+                      for hero_id in rng.sample(HERO_IDS, rng.randint(1, 2))]
+            players.append({"player_uid": str(uid), "name": f"player{uid}", "hero_id": heroes[0]["hero_id"], "is_win": team == 0,
+                            "kills": rng.randint(0, 30), "deaths": rng.randint(0, 20), "assists": rng.randint(0, 30),
+                            "hero_damage": rng.uniform(0, 40000), "hero_healed": rng.uniform(0, 20000),
+                            "damage_taken": rng.uniform(0, 40000), "heroes": heroes})
+    return {"match_uid": match_uid, "replay_id": str(rng.randint(10 ** 9, 10 ** 10)), "gamemode": {"name": "competitive"},
+            "mvp": {"player_uid": players[0]["player_uid"]}, "svp": {"player_uid": players[6]["player_uid"]}, "players": players}
+
+
+def synthesize(store, leaderboard_size=500, players=5000, matches=20000, private_rate=0.1, seed=0):
+    """Fills a FixtureStore with a consistent synthetic API: leaderboard, players, matches, heroes and hero leaderboards."""
+    rng = random.Random(seed)
+    now = int(time.time())
+    player_ids = list(range(100000, 100000 + players))
+    match_ids = [f"{i}_{now // 100000}_1_11001_10" for i in range(matches)]
+
+    def put(key, payload, status=200):
+        store.record(f"/api/{key}", status, "application/json", json.dumps(payload).encode())
+
+    leaderboard = [{"rank": i + 1, "player_name": f"player{uid}", "rank_name": "One Above All", "score": 6000 - i,
+                    "matches": 200, "player_id": str(uid)} for i, uid in enumerate(player_ids[:leaderboard_size])]
+    put("leaderboard", leaderboard)
+    for uid in player_ids:
+        put(f"player-update/{uid}", {"success": True})
+        if rng.random() < private_rate:
+            store.record(f"/api/player/{uid}", 500, "text/plain", b"private profile")
+        else:
+            put(f"player/{uid}", _synthetic_player(rng, uid, match_ids, player_ids, now))
+    for match_uid in match_ids:
+        put(f"match/{match_uid}", _synthetic_match(rng, match_uid, player_ids))
+    put("heroes", [{"id": hero_id, "slug": f"hero{hero_id}",
+                    "meta": [{"platform": "pc", "mode": "ranked", "rank": "all", "appearance_rate": 5.0, "win_rate": 50.0}]}
+                   for hero_id in HERO_IDS])
+    for hero_id in HERO_IDS:
+        put(f"leaderboard/hero{hero_id}", [{"rank": i + 1, "player_name": f"player{uid}", "score": 1000 - i, "matches": 50,
+                                             "player_id": str(uid)} for i, uid in enumerate(rng.sample(player_ids, min(leaderboard_size, players)))])
+
+
+# ---------------------------
+# Replay server
+# ---------------------------
+def make_app(store, latency=0.0, jitter=0.0, error_429=0.0, error_500=0.0, retry_after=1):
+    """aiohttp app that answers /api/<path> from the store after `latency` (± `jitter`) seconds.
+
+    A share `error_429` of requests gets a 429 with Retry-After and a share `error_500`
+    a 500, before the fixture is looked up. GET /_stats returns request counts per
+    endpoint and status.
+    """
+    from aiohttp import web
+
+    stats = defaultdict(lambda: defaultdict(int))
+    rng = random.Random()
+
+    async def handle(request):
+        key = request.match_info["key"]
+        endpoint = key.split("/")[0]
+        delay = latency + rng.uniform(-jitter, jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        roll = rng.random()
+        if roll < error_429:
+            stats[endpoint]["429"] += 1
+            return web.Response(status=429, headers={"Retry-After": str(retry_after)})
+        if roll < error_429 + error_500:
+            stats[endpoint]["500"] += 1
+            return web.Response(status=500)
+        fixture = store.get(key)
+        if fixture is None:
+            stats[endpoint]["404"] += 1
+            return web.Response(status=404)
+        status, content_type, body = fixture
+        stats[endpoint][str(status)] += 1
+        return web.Response(status=status, body=body, headers={"Content-Type": content_type or "application/json"})
+
+    async def handle_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_get("/_stats", handle_stats)
+    app.router.add_get("/api/{key:.+}", handle)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record/replay fixtures of the mrapi.org API.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="replay a fixture file as a local HTTP server")
+    serve_parser.add_argument("fixtures")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--latency-ms", type=float, default=0, help="delay before every response")
+    serve_parser.add_argument("--jitter-ms", type=float, default=0, help="random ± spread of the delay")
+    serve_parser.add_argument("--error-429", type=float, default=0, help="share of requests answered with 429")
+    serve_parser.add_argument("--error-500", type=float, default=0, help="share of requests answered with 500")
+
+    synth_parser = subparsers.add_parser("synthesize", help="write a synthetic fixture file")
+    synth_parser.add_argument("fixtures")
+    synth_parser.add_argument("--leaderboard", type=int, default=500, help="leaderboard entries (default 500)")
+    synth_parser.add_argument("--players", type=int, default=5000, help="distinct players (default 5000)")
+    synth_parser.add_argument("--matches", type=int, default=20000, help="distinct matches (default 20000)")
+    synth_parser.add_argument("--seed", type=int, default=0)
+
+    stats_parser = subparsers.add_parser("stats", help="count the fixtures of a file per endpoint")
+    stats_parser.add_argument("fixtures")
+    args = parser.parse_args()
+
+    store = FixtureStore(args.fixtures)
+    if args.command == "serve":
+        from aiohttp import web
+        app = make_app(store, args.latency_ms / 1000, args.jitter_ms / 1000, args.error_429, args.error_500)
+        print(f"Replaying {args.fixtures} on http://{args.host}:{args.port}/api/")
+        web.run_app(app, host=args.host, port=args.port, print=None)
+    elif args.command == "synthesize":
+        synthesize(store, args.leaderboard, args.players, args.matches, seed=args.seed)
+    for endpoint, count in sorted(store.counts().items()):
+        print(f"{endpoint}: {count} fixtures")
+    store.close()
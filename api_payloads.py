@@ -0,0 +1,215 @@
+import json
+from typing import Any, Dict, List, TypedDict
+
+# msgspec decodes straight into the schemas below and skips every other field
+# without building it; orjson (or the json module) is the fallback and decodes the
+# whole document. Both are optional: pip install msgspec orjson
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# ---------------------------
+# Schemas: the fields of the mrapi.org payloads some script reads (total=False:
+# any of them may be missing, exactly as in the full document). Leaf values stay
+# Any so that an ID sent as a string instead of a number still decodes.
+# ---------------------------
+class PlayerRank(TypedDict, total=False):
+    score: Any
+
+
+class ModeStats(TypedDict, total=False):
+    total_assists: Any
+    total_deaths: Any
+    total_kills: Any
+    total_time_played: Any
+    total_matches: Any
+    total_wins: Any
+
+
+class PlayerStats(TypedDict, total=False):
+    rank: PlayerRank
+    total_matches: Any
+    total_wins: Any
+    ranked: ModeStats
+    unranked: ModeStats
+
+
+class HeroRanked(TypedDict, total=False):
+    matches: Any
+    wins: Any
+    mvp: Any
+    svp: Any
+    kills: Any
+    deaths: Any
+    assists: Any
+    damage_given: Any
+    damage_received: Any
+    heal: Any
+    playtime: Any
+
+
+class HeroMatchup(TypedDict, total=False):
+    matches: Any
+    wins: Any
+
+
+class HeroStats(TypedDict, total=False):
+    ranked: HeroRanked
+    matchup: HeroMatchup
+
+
+class RankChange(TypedDict, total=False):
+    old_level: Any
+    new_level: Any
+    old_score: Any
+    new_score: Any
+
+
+class RankHistoryEntry(TypedDict, total=False):
+    timestamp: Any
+    rank: RankChange
+
+
+class WinLoss(TypedDict, total=False):
+    matches: Any
+    wins: Any
+
+
+class Teammate(TypedDict, total=False):
+    player_uid: Any
+    stats: WinLoss
+
+
+class IdField(TypedDict, total=False):
+    id: Any
+
+
+class RawField(TypedDict, total=False):
+    raw: Any
+
+
+class MatchScore(TypedDict, total=False):
+    ally: Any
+    enemy: Any
+
+
+class PlayerMatchStats(TypedDict, total=False):
+    kills: Any
+    deaths: Any
+    assists: Any
+    is_win: Any
+    hero: IdField
+    has_escaped: Any
+
+
+class PlayerMatch(TypedDict, total=False):
+    match_uid: Any
+    match_map: IdField
+    match_duration: RawField
+    season: Any
+    winner_side: Any
+    mvp_uid: Any
+    svp_uid: Any
+    match_timestamp: Any
+    gamemode: IdField
+    score: MatchScore
+    stats: PlayerMatchStats
+
+
+class Player(TypedDict, total=False):
+    """GET player/{id}, also the data/latest/users/<user>.json profiles."""
+    player_name: Any
+    is_profile_private: Any
+    stats: PlayerStats
+    hero_stats: Dict[str, HeroStats]
+    rank_history: List[RankHistoryEntry]
+    teammates: List[Teammate]
+    match_history: List[PlayerMatch]
+
+
+class MatchHero(TypedDict, total=False):
+    hero_id: Any
+    playtime: RawField
+    kills: Any
+    deaths: Any
+    assists: Any
+    hit_rate: Any
+
+
+class MatchPlayer(TypedDict, total=False):
+    player_uid: Any
+    name: Any
+    hero_id: Any
+    is_win: Any
+    kills: Any
+    deaths: Any
+    assists: Any
+    hero_damage: Any
+    hero_healed: Any
+    damage_taken: Any
+    heroes: List[MatchHero]
+
+
+class PlayerRef(TypedDict, total=False):
+    player_uid: Any
+
+
+class NameField(TypedDict, total=False):
+    name: Any
+
+
+class Match(TypedDict, total=False):
+    """GET match/{id}."""
+    match_uid: Any
+    replay_id: Any
+    gamemode: NameField
+    mvp: PlayerRef
+    svp: PlayerRef
+    players: List[MatchPlayer]
+
+
+class LeaderboardEntry(TypedDict, total=False):
+    rank: Any
+    player_name: Any
+    rank_name: Any
+    score: Any
+    matches: Any
+    player_id: Any
+
+
+# Endpoint (as rate_limiter.endpoint_name() names it) -> payload schema
+PAYLOAD_TYPES = {
+    "player": Player,
+    "match": Match,
+    "leaderboard": List[LeaderboardEntry],
+}
+_decoders = {endpoint: msgspec.json.Decoder(schema) for endpoint, schema in PAYLOAD_TYPES.items()} if msgspec else {}
+
+
+def _loads(body):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def loads(body, endpoint=None):
+    """Decodes a JSON body (bytes or str) into dicts and lists, keeping only the fields of the endpoint's schema.
+
+    A payload shaped differently than its schema (e.g. null where an object was
+    expected) is decoded in full instead. Invalid JSON raises ValueError.
+    """
+    decoder = _decoders.get(endpoint)
+    if decoder is not None:
+        try:
+            return decoder.decode(body)
+        except msgspec.ValidationError:
+            pass
+        except msgspec.DecodeError as e:
+            raise ValueError(f"invalid JSON: {e}") from e
+    return _loads(body)
@@ -0,0 +1,238 @@
+"""Times the ingestion and merge scripts on synthetic data at several multiples of today's volume.
+
+    python benchmarks/bench.py                      # every case at 1x, 10x and 100x
+    python benchmarks/bench.py --scales 1 10 --cases save_to_disk merge_stats
+
+Every case runs in its own interpreter inside a scratch directory holding the
+generated data, so the scripts' module-level side effects (CSV sinks, crawl index)
+never touch the real data/ tree and peak RSS belongs to that case alone.
+Results are written as JSON to benchmarks/results/ for comparing runs.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+DEFAULT_SCALES = [1, 10, 100]
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import synthetic
+
+
+def _measure(func):
+    """Runs func once for wall time, then once more under tracemalloc for its peak Python allocation.
+
+    tracemalloc does not see Arrow buffers, so the peak of pyarrow's memory pool
+    during the first run is reported as well (arrow_peak_mb).
+    """
+    import pyarrow as pa
+    start = time.perf_counter()
+    rows = func()
+    seconds = time.perf_counter() - start
+    arrow_peak = pa.default_memory_pool().max_memory()
+    tracemalloc.start()
+    func()
+    python_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"rows": rows, "seconds": seconds, "python_peak_mb": python_peak / 1024 / 1024,
+            "arrow_peak_mb": arrow_peak / 1024 / 1024}
+
+
+def _run_script(path, argv):
+    """Runs a whole script once; its memory shows up in the process' peak RSS."""
+    sys.argv = [path] + argv
+    start = time.perf_counter()
+    runpy.run_path(path, run_name="__main__")
+    return {"seconds": time.perf_counter() - start}
+
+
+# ---------------------------
+# Cases: (setup in the scratch directory, run inside the child interpreter)
+# ---------------------------
+def setup_matches(directory, scale):
+    synthetic.write_matches(directory, scale)
+
+
+def run_load_existing_matches(scale):
+    import LeaderboardStats
+    return _measure(lambda: len(LeaderboardStats.load_existing_matches()))
+
+
+def setup_players(directory, scale):
+    from player_registry import PlayerRegistry
+    synthetic.write_player_encounters(directory, scale)
+    # Steady state: the old CSV was imported into the registry by an earlier run
+    historical = os.path.join(directory, "data/historical")
+    PlayerRegistry(os.path.join(historical, "player_registry"),
+                   legacy_csv=os.path.join(historical, "player_encounters.csv")).save()
+
+
+def run_load_existing_players(scale):
+    import LeaderboardStats
+    return _measure(lambda: len(LeaderboardStats.load_existing_players()))
+
+
+def run_save_encountered_players(scale):
+    import LeaderboardStats
+    players = LeaderboardStats.encountered_players
+    uids = players.uids[:len(players)][::10].tolist()  # A run refreshes about a tenth of the known players
+
+    def save():
+        for uid in uids:
+            players.record(uid, None, 4000, 100, 50)
+        LeaderboardStats.save_encountered_players()
+        return len(uids)
+    return _measure(save)
+
+
+def run_save_to_disk(scale):
+    import LeaderboardStats
+    players, heroes = synthetic.match_player_rows(scale)
+
+    def save():
+        # Collecting the rows (typed columns, flushed every FLUSH_ROWS rows) is part of the cost
+        LeaderboardStats.match_players_data.extend(players)
+        LeaderboardStats.match_player_heroes_data.extend(heroes)
+        LeaderboardStats.save_to_disk()
+        return len(players) + len(heroes)
+    return _measure(save)
+
+
+def setup_user(directory, scale):
+    from history_index import HistoryIndex
+    synthetic.write_user(directory, scale)
+    # Steady state: every history already has its sidecar index from earlier runs
+    user_dir = os.path.join(directory, f"data/historical/users/{synthetic.BENCH_USER}")
+    for name, order_column in (("stats", 0), ("rank_history", 0), ("match_history", 7), ("hero_matchups", 0), ("teammates", 0)):
+        HistoryIndex(os.path.join(user_dir, f"{name}.csv"), order_column).add([])
+
+
+def run_merge_stats(scale):
+    return _run_script(os.path.join(REPO_DIR, "merge_stats.py"), [synthetic.BENCH_USER])
+
+
+def run_hero_leaderboard_csv(scale):
+    import merge_hero_leaderboard
+    merge_hero_leaderboard.storage = "csv"
+    os.makedirs(merge_hero_leaderboard.LEADERBOARD_DIR, exist_ok=True)
+    rows = synthetic.hero_leaderboard_rows(scale)
+
+    def write():
+        writer = merge_hero_leaderboard.LeaderboardWriter("hero1011")
+        for row in rows:
+            writer.write(row)
+        writer.close()
+        return len(rows)
+    return _measure(write)
+
+
+def setup_ranks(directory, scale):
+    synthetic.write_ranks(directory, scale)
+
+
+def run_merge_rank_population(scale):
+    return _run_script(os.path.join(REPO_DIR, "merge_rank_population.py"), [])
+
+
+CASES = {
+    "load_existing_matches": (setup_matches, run_load_existing_matches),
+    "load_existing_players": (setup_players, run_load_existing_players),
+    "save_encountered_players": (setup_players, run_save_encountered_players),
+    "save_to_disk": (None, run_save_to_disk),
+    "merge_stats": (setup_user, run_merge_stats),
+    "merge_hero_leaderboard_csv": (None, run_hero_leaderboard_csv),
+    "merge_rank_population": (setup_ranks, run_merge_rank_population),
+}
+
+
+def run_child(case, scale):
+    """Entry point of the child interpreter: runs one case and prints its result as the last line."""
+    os.makedirs("data/historical", exist_ok=True)
+    result = CASES[case][1](scale)
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    sys.stdout.flush()
+    print("\n" + json.dumps(result))
+
+
+def run_case(case, scale, keep=False):
+    setup, _ = CASES[case]
+    directory = tempfile.mkdtemp(prefix=f"bench-{case}-{scale}x-")
+    try:
+        os.makedirs(os.path.join(directory, "data/historical"), exist_ok=True)
+        if setup is not None:
+            setup(directory, scale)
+        env = dict(os.environ, RESPONSE_CACHE_FILE=os.path.join(directory, ".cache/responses.sqlite"))
+        env.pop("MRAPI_RECORD", None)
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", case, "--scale", str(scale)],
+            cwd=directory, env=env, capture_output=True, text=True,
+        )
+        if process.returncode != 0:
+            return {"case": case, "scale": scale, "error": process.stderr.strip().splitlines()[-1:]}
+        return dict({"case": case, "scale": scale}, **json.loads(process.stdout.strip().splitlines()[-1]))
+    finally:
+        if not keep:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the ingestion and merge scripts on synthetic data.")
+    parser.add_argument("--scales", type=float, nargs="+", default=DEFAULT_SCALES,
+                        help=f"multiples of today's data volume (default {DEFAULT_SCALES})")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--output", help="result file (default benchmarks/results/bench-<utc time>.json)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directories for inspection")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--scale", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.scale)
+        sys.exit(0)
+
+    started = datetime.now(timezone.utc)
+    results = []
+    for case in args.cases:
+        for scale in args.scales:
+            result = run_case(case, scale, args.keep)
+            results.append(result)
+            if "error" in result:
+                print(f"❌ {case} @ {scale:g}x failed: {result['error']}")
+            else:
+                python_peak = f", python peak {result['python_peak_mb']:.1f} MB" if "python_peak_mb" in result else ""
+                if "arrow_peak_mb" in result:
+                    python_peak += f", arrow peak {result['arrow_peak_mb']:.1f} MB"
+                print(f"⏱️ {case} @ {scale:g}x: {result['seconds']:.3f}s, peak RSS {result['peak_rss_mb']:.1f} MB{python_peak}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{started.strftime('%Y%m%dT%H%M%SZ')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "started_at": started.isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "baseline_rows": synthetic.BASELINE,
+            "results": results,
+        }, f, indent=2)
+    print(f"✅ Wrote {len(results)} results to {output}")
@@ -0,0 +1,156 @@
+"""Synthetic data for the benchmarks, sized as a multiple of today's data/historical volume."""
+import csv
+import json
+import os
+import random
+import time
+
+# Row counts of the committed data/historical at scale 1
+BASELINE = {
+    "matches": 8342,
+    "player_encounters": 6868,
+    "match_players": 38518,
+    "match_player_heroes": 60498,
+    "ranks_historical": 2416,
+    "hero_leaderboard": 11915,  # Rows per hero CSV
+    "user_stats": 110,
+    "user_rank_history": 81,
+    "user_match_history": 153,
+    "user_hero_matchups": 2470,
+    "user_teammates": 1001,
+}
+HERO_IDS = [1011, 1014, 1015, 1016, 1017, 1018, 1020, 1021, 1022, 1023, 1024, 1025]
+RANKS = ["bronze", "silver", "gold", "platinum", "diamond", "grandmaster", "celestial", "eternity", "one_above_all"]
+BENCH_USER = "100000001"
+
+
+def rows_at(name, scale):
+    return int(BASELINE[name] * scale)
+
+
+def _write_csv(path, header, rows):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def _match_uid(i, now):
+    return f"{i}_{now - i}_{i % 100}_11001_50"
+
+
+def write_matches(directory, scale, seed=0):
+    rng = random.Random(seed)
+    now = int(time.time())
+    _write_csv(
+        os.path.join(directory, "data/historical/matches.csv"),
+        ["match_uid", "replay_id", "gamemode", "match_timestamp", "season", "match_map_id", "mvp", "svp", "winning_team_score", "losing_team_score"],
+        ([_match_uid(i, now), rng.randint(10 ** 10, 10 ** 11), "competitive", now - i * 60, 3, 1272,
+          rng.randint(10 ** 8, 10 ** 9), rng.randint(10 ** 8, 10 ** 9), 3, rng.randint(0, 2)]
+         for i in range(rows_at("matches", scale))),
+    )
+
+
+def write_player_encounters(directory, scale, seed=0):
+    rng = random.Random(seed)
+    _write_csv(
+        os.path.join(directory, "data/historical/player_encounters.csv"),
+        ["player_uid", "player_name", "highest_score", "latest_score", "matches", "wins"],
+        ([10 ** 8 + i, f"player{i}", rng.randint(3000, 6000), rng.randint(3000, 6000), rng.randint(1, 300), rng.randint(0, 150)]
+         for i in range(rows_at("player_encounters", scale))),
+    )
+
+
+def match_player_rows(scale, seed=0):
+    """The rows LeaderboardStats.py appends to match_players_data and match_player_heroes_data."""
+    rng = random.Random(seed)
+    now = int(time.time())
+    players, heroes = [], []
+    for i in range(rows_at("match_players", scale)):
+        match_uid = _match_uid(i // 12, now)
+        match_timestamp = now - (i // 12) * 600
+        player_uid = 10 ** 8 + rng.randint(0, 10 ** 6)
+        hero_ids = rng.sample(HERO_IDS, 2 if rng.random() < BASELINE["match_player_heroes"] / BASELINE["match_players"] - 1 else 1)
+        players.append({
+            "match_uid": match_uid, "player_uid": player_uid, "name": f"player{player_uid}", "hero_id": hero_ids[0],
+            "is_win": rng.random() < 0.5, "kills": rng.randint(0, 30), "deaths": rng.randint(0, 20), "assists": rng.randint(0, 30),
+            "hero_damage": rng.uniform(0, 40000), "hero_healed": rng.uniform(0, 20000), "damage_taken": rng.uniform(0, 40000),
+            "match_timestamp": match_timestamp,
+        })
+        for hero_id in hero_ids:
+            heroes.append({
+                "match_uid": match_uid, "player_uid": player_uid, "hero_id": hero_id, "playtime": rng.uniform(60, 900),
+                "kills": rng.randint(0, 15), "deaths": rng.randint(0, 10), "assists": rng.randint(0, 15),
+                "hit_rate": rng.random(), "match_timestamp": match_timestamp,
+            })
+    return players, heroes
+
+
+def write_ranks(directory, scale, seed=0):
+    rng = random.Random(seed)
+    _write_csv(
+        os.path.join(directory, "data/historical/ranks_historical.csv"),
+        ["timestamp", "rank", "division", "population_count"],
+        ([f"2025-02-02T14:48:34.{i:06d}", RANKS[i % len(RANKS)], i % 3 + 1, rng.randint(1000, 1500000)]
+         for i in range(rows_at("ranks_historical", scale))),
+    )
+    latest = {rank: {"1": rng.randint(1000, 1500000), "2": rng.randint(1000, 1500000), "3": rng.randint(1000, 1500000),
+                     "image": f"https://mrapi.org/assets/ranks/{rank}.png"} for rank in RANKS}
+    os.makedirs(os.path.join(directory, "data/latest"), exist_ok=True)
+    with open(os.path.join(directory, "data/latest/latest_ranks.json"), "w", encoding="utf-8") as f:
+        json.dump(latest, f)
+
+
+def hero_leaderboard_rows(scale, hero_slug="hero1011", seed=0):
+    """Rows shaped like merge_hero_leaderboard.build_leaderboard_row() returns them."""
+    rng = random.Random(seed)
+    timestamp = "2025-03-01T00:00:00.000000"
+    return [[timestamp, hero_slug, i % 500 + 1, f"player{i}", 1000 - i % 500, 50, 10 ** 8 + i,
+             rng.randint(1, 100), rng.randint(0, 60), 3, 2, 400, 200, 300, 250000.5, 200000.5, 1000.0, "12h 5m 3s", 20, 11]
+            for i in range(rows_at("hero_leaderboard", scale))]
+
+
+def write_user(directory, scale, user=BENCH_USER, seed=0):
+    """History CSVs of one profile plus a latest/users JSON for merge_stats.py, half of it already recorded."""
+    rng = random.Random(seed)
+    now = int(time.time())
+    user_dir = os.path.join(directory, f"data/historical/users/{user}")
+    _write_csv(os.path.join(user_dir, "stats.csv"),
+               ["timestamp", "ranked_assists", "ranked_deaths", "ranked_kills", "ranked_time_played", "ranked_matches",
+                "ranked_matches_wins", "total_matches", "total_wins", "unranked_assists", "unranked_deaths", "unranked_kills",
+                "unranked_time_played", "unranked_matches", "unranked_matches_wins"],
+               ([f"2025-02-04T09:10:{i:09d}+00:00", 466, 1371, 4064, "39h 42m 33s", 211, 105, 414, 217, 629, 1137, 2945, "27h 52m 6s", 194, 111]
+                for i in range(rows_at("user_stats", scale))))
+    rank_history = [[now - i * 3600, 13, 14, 4293, 4318] for i in range(rows_at("user_rank_history", scale))]
+    _write_csv(os.path.join(user_dir, "rank_history.csv"), ["timestamp", "from_level", "to_level", "old_score", "new_score"], rank_history)
+    match_history = [(_match_uid(i, now), 1230, 825, 3, 0, 2064328969, 261498396, now - i * 600, 2, 14, 12, 0, False, 1037, False)
+                     for i in range(rows_at("user_match_history", scale))]
+    _write_csv(os.path.join(user_dir, "match_history.csv"),
+               ["match_uid", "map_id", "duration", "season", "winner_side", "mvp_uid", "svp_uid", "timestamp",
+                "game_mode_id", "kills", "deaths", "assists", "is_win", "hero_id", "has_escaped"], match_history)
+    _write_csv(os.path.join(user_dir, "hero_matchups.csv"), ["timestamp", "hero_id", "matches", "wins"],
+               ([f"2025-02-03T12:27:59.{i:06d}", rng.choice(HERO_IDS), 14, 7] for i in range(rows_at("user_hero_matchups", scale))))
+    _write_csv(os.path.join(user_dir, "teammates.csv"), ["timestamp", "player_uid", "matches", "wins"],
+               ([f"2025-02-04T09:10:27.{i:06d}+00:00", 10 ** 8 + i, 19, 12] for i in range(rows_at("user_teammates", scale))))
+
+    # The latest profile repeats the newer half of the recorded history and adds as much again
+    mode_stats = {"total_assists": 466, "total_deaths": 1371, "total_kills": 4064, "total_time_played": "39h 42m 33s",
+                  "total_matches": 211, "total_wins": 105}
+    latest = {
+        "stats": {"ranked": mode_stats, "unranked": mode_stats, "total_matches": 414, "total_wins": 217},
+        "rank_history": [{"timestamp": ts + len(rank_history) // 2 * 3600,
+                          "rank": {"old_level": old, "new_level": new, "old_score": old_score, "new_score": new_score}}
+                         for ts, old, new, old_score, new_score in rank_history],
+        "match_history": [{"match_uid": _match_uid(i - len(match_history) // 2, now), "match_map": {"id": 1230},
+                           "match_duration": {"raw": 825}, "season": 3, "winner_side": 0, "mvp_uid": 2064328969,
+                           "svp_uid": 261498396, "match_timestamp": now - (i - len(match_history) // 2) * 600,
+                           "gamemode": {"id": 2}, "stats": {"kills": 14, "deaths": 12, "assists": 0, "is_win": False,
+                                                            "hero": {"id": 1037}, "has_escaped": False}}
+                          for i in range(len(match_history))],
+        "hero_stats": {str(hero_id): {"matchup": {"matches": 14, "wins": 7}} for hero_id in HERO_IDS},
+        "teammates": [{"player_uid": 10 ** 8 + i, "stats": {"matches": 19, "wins": 12}} for i in range(100)],
+    }
+    os.makedirs(os.path.join(directory, "data/latest/users"), exist_ok=True)
+    with open(os.path.join(directory, f"data/latest/users/{user}.json"), "w", encoding="utf-8") as f:
+        json.dump(latest, f)
@@ -0,0 +1,115 @@
+import threading
+import pyarrow as pa
+
+BATCH_ROWS = 5000  # Rows kept as Python values before they are packed into a typed record batch
+FLUSH_ROWS = 200000  # Rows held in memory before they are handed to the sink
+
+
+class ColumnarBuffer:
+    """Bounded, thread-safe row buffer that keeps rows as typed Arrow columns.
+
+    append() takes a row dict and adds its values to one Python list per schema
+    field; every BATCH_ROWS rows the lists are converted into a RecordBatch of the
+    schema's types and emptied. Once FLUSH_ROWS rows are held (checked at the end
+    of each append() or extend(), so rows added together are flushed together),
+    flush() passes them to `sink` as one pa.Table and lets go of them, so memory
+    stays bounded however many rows a run collects. `converters` maps a field to a function turning its
+    list of values into an array, for values pyarrow can't convert directly.
+    """
+
+    def __init__(self, schema, sink, flush_rows=FLUSH_ROWS, batch_rows=BATCH_ROWS, converters=None):
+        self.schema = schema
+        self.sink = sink
+        self.flush_rows = flush_rows
+        self.batch_rows = batch_rows
+        self.converters = converters or {}
+        self.lock = threading.Lock()
+        self.columns = {name: [] for name in schema.names}
+        self.pending = 0  # Rows in self.columns
+        self.batches = []
+        self.rows_held = 0  # Rows in self.batches and self.columns
+        self.rows_flushed = 0
+
+    def __len__(self):
+        return self.rows_held
+
+    def _column(self, field, values):
+        convert = self.converters.get(field.name)
+        if convert is not None:
+            return pa.array(convert(values), type=field.type)
+        try:
+            return pa.array(values, type=field.type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # e.g. IDs the API sent as strings
+            return pa.array(values).cast(field.type)
+
+    def _batch(self, columns):
+        arrays = [self._column(field, columns[field.name]) for field in self.schema]
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def _seal(self):
+        """Packs the rows in the Python lists into a record batch.
+
+        Rows with a value that can't be converted to its field's type are dropped
+        (and reported), so one bad row never blocks the others from being flushed.
+        """
+        if not self.pending:
+            return
+        columns, count = self.columns, self.pending
+        self.columns = {name: [] for name in self.schema.names}
+        self.pending = 0
+        try:
+            self.batches.append(self._batch(columns))
+            return
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError) as e:
+            error = e
+        # Convert row by row (this also handles columns mixing e.g. ints and numeric strings)
+        rows = []
+        for row in range(count):
+            try:
+                rows.append(self._batch({name: values[row:row + 1] for name, values in columns.items()}))
+            except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+                pass
+        if len(rows) < count:
+            print(f"⚠️ Dropped {count - len(rows)} of {count} rows that don't fit the schema: {error}")
+            self.rows_held -= count - len(rows)
+        if rows:
+            self.batches.extend(pa.Table.from_batches(rows, schema=self.schema).combine_chunks().to_batches())
+
+    def append(self, row):
+        self.extend([row])
+
+    def extend(self, rows):
+        """Adds rows as one unit: they are never split between two flushes (e.g. all players of a match)."""
+        with self.lock:
+            for row in rows:
+                for name, values in self.columns.items():
+                    values.append(row.get(name))
+                self.pending += 1
+                self.rows_held += 1
+                if self.pending >= self.batch_rows:
+                    self._seal()
+            if self.rows_held >= self.flush_rows:
+                self._flush()
+
+    def to_table(self):
+        """The rows held right now (not the ones already flushed)."""
+        with self.lock:
+            self._seal()
+            return pa.Table.from_batches(self.batches, schema=self.schema)
+
+    def _flush(self):
+        self._seal()
+        if not self.batches:
+            return 0
+        table = pa.Table.from_batches(self.batches, schema=self.schema)
+        self.sink(table)
+        self.batches = []
+        self.rows_held = 0
+        self.rows_flushed += table.num_rows
+        return table.num_rows
+
+    def flush(self):
+        """Hands every held row to the sink. Returns the number of rows."""
+        with self.lock:
+            return self._flush()
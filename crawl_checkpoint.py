@@ -0,0 +1,84 @@
+import json
+import os
+import shutil
+import time
+
+
+class CrawlCheckpoint:
+    """Local journal that lets an interrupted crawl continue where it stopped.
+
+    Rows are written to the output files under data/ as the crawl goes, but those
+    only last once the run's data/ is committed. Until then every checkpoint also
+    appends the rows recorded since the previous one to a <name>.jsonl journal, so
+    a run that never got its data/ committed can write them again. Everything else
+    (frontier, encountered players, match info, counters) is small and is
+    rewritten atomically to state.json, which also records how many rows of each
+    journal belong to it; a torn tail left by a crash is ignored on load. load()
+    drops the journal rows the caller knows are saved for good.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.state_file = os.path.join(directory, "state.json")
+        self.rows_written = {}
+
+    def _journal_file(self, name):
+        return os.path.join(self.directory, f"{name}.jsonl")
+
+    def exists(self):
+        return os.path.exists(self.state_file)
+
+    def journal_rows(self):
+        """Rows held in all journals."""
+        return sum(self.rows_written.values())
+
+    def save(self, state, **journals):
+        """Appends the given rows (those recorded since the last save) to their journals and replaces the state file."""
+        os.makedirs(self.directory, exist_ok=True)
+        for name, rows in journals.items():
+            with open(self._journal_file(name), "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.rows_written[name] = self.rows_written.get(name, 0) + len(rows)
+
+        state = dict(state, journal_rows=dict(self.rows_written), saved_at=time.time())
+        tmp_file = self.state_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.state_file)
+
+    def load(self, keep=None):
+        """Returns (state, {journal name: rows}) of the last checkpoint.
+
+        Rows for which keep(name, row) is false are dropped, from the journal files too.
+        """
+        with open(self.state_file, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        journals = {}
+        for name, count in state["journal_rows"].items():
+            rows = []
+            if count and os.path.exists(self._journal_file(name)):
+                with open(self._journal_file(name), "r", encoding="utf-8") as f:
+                    for line in f:
+                        if len(rows) == count:
+                            break
+                        rows.append(json.loads(line))
+            if keep is not None:
+                rows = [row for row in rows if keep(name, row)]
+            # Drop anything written after the checkpoint we are resuming from
+            tmp_file = self._journal_file(name) + ".tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, separators=(",", ":")) + "\n")
+            os.replace(tmp_file, self._journal_file(name))
+            self.rows_written[name] = len(rows)
+            journals[name] = rows
+        return state, journals
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.rows_written = {}
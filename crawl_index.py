@@ -0,0 +1,69 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class CrawlIndex:
+    """Persistent index of every fetched match and player UID with its last fetch time.
+
+    Backed by one SQLite table keyed by (kind, uid), so lookups and inserts cost the
+    same no matter how much history has been collected. Safe to share between threads.
+    Marks are only made durable by commit() (or close()): callers commit once the
+    rows of every marked item are saved, so an item in the index always has its rows.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS fetched ("
+            " kind TEXT NOT NULL,"
+            " uid TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " PRIMARY KEY (kind, uid)"
+            ") WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def last_fetched(self, kind, uid):
+        """Returns the unix time uid was last fetched, or None if it never was."""
+        with self.lock:
+            row = self.conn.execute("SELECT fetched_at FROM fetched WHERE kind = ? AND uid = ?", (kind, str(uid))).fetchone()
+        return None if row is None else row[0]
+
+    def seen(self, kind, uid):
+        return self.last_fetched(kind, uid) is not None
+
+    def fetched_within(self, kind, uid, seconds):
+        """True if uid was fetched less than `seconds` ago."""
+        last = self.last_fetched(kind, uid)
+        return last is not None and time.time() - last < seconds
+
+    def mark(self, kind, uid, fetched_at=None):
+        self.mark_many(kind, [uid], fetched_at)
+
+    def mark_many(self, kind, uids, fetched_at=None):
+        """Records uids as fetched at `fetched_at` (default: now), visible right away and on disk after commit()."""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        rows = [(kind, str(uid), fetched_at) for uid in uids]
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO fetched (kind, uid, fetched_at) VALUES (?, ?, ?)", rows)
+
+    def count(self, kind):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM fetched WHERE kind = ?", (kind,)).fetchone()[0]
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
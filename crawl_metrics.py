@@ -0,0 +1,168 @@
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_FILE = "crawl_metrics.json"
+PROMETHEUS_PREFIX = "rivalsstats_"
+# Upper bounds (seconds) of the histogram buckets, Prometheus style
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800)
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimated from the buckets (upper bound of the bucket holding the q-th value)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (self.max,), self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "mean": round(self.sum / self.count, 4) if self.count else 0.0,
+            "min": round(self.min, 4) if self.count else 0.0,
+            "max": round(self.max, 4),
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": {str(bound): count for bound, count in zip(self.buckets + ("+Inf",), self.counts)},
+        }
+
+
+class CrawlMetrics:
+    """Counters, gauges and latency histograms of one crawl, keyed by name and labels.
+
+    Safe to update from any thread or asyncio task. write() dumps everything as JSON
+    (plus any extra sections, e.g. the rate limiter stats) and, if a path is set,
+    as a Prometheus text file for node_exporter's textfile collector.
+    """
+
+    def __init__(self, metrics_file=METRICS_FILE, prometheus_file=None):
+        self.metrics_file = metrics_file
+        self.prometheus_file = prometheus_file
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def value(self, name, **labels):
+        with self.lock:
+            return self.counters.get((name, _label_key(labels)), 0)
+
+    def gauge(self, name, value, **labels):
+        """Sets a gauge; the summary keeps both its last and its highest value."""
+        key = (name, _label_key(labels))
+        with self.lock:
+            _, peak = self.gauges.get(key, (value, value))
+            self.gauges[key] = (value, max(peak, value))
+
+    def adjust(self, name, delta, **labels):
+        """Moves a gauge up or down, e.g. +1/-1 around an in-flight request."""
+        key = (name, _label_key(labels))
+        with self.lock:
+            value, peak = self.gauges.get(key, (0, 0))
+            self.gauges[key] = (value + delta, max(peak, value + delta))
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start, **labels)
+
+    def summary(self, **sections):
+        def entries(items, render):
+            result = {}
+            for (name, labels), item in sorted(items.items(), key=lambda entry: entry[0]):
+                result.setdefault(name, []).append(dict(labels=dict(labels), **render(item)))
+            return result
+
+        with self.lock:
+            summary = {
+                "started_at": self.started,
+                "elapsed_seconds": round(time.time() - self.started, 3),
+                "counters": entries(self.counters, lambda value: {"value": value}),
+                "gauges": entries(self.gauges, lambda value: {"value": value[0], "max": value[1]}),
+                "histograms": entries(self.histograms, Histogram.summary),
+            }
+        summary.update(sections)
+        return summary
+
+    def prometheus_text(self):
+        def series(name, labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return PROMETHEUS_PREFIX + name
+            return PROMETHEUS_PREFIX + name + "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+        lines = []
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{series(name + '_total', labels)} {value}")
+            for (name, labels), (value, _) in sorted(self.gauges.items()):
+                lines.append(f"{series(name, labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(f"{series(name + '_bucket', labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{series(name + '_sum', labels)} {histogram.sum}")
+                lines.append(f"{series(name + '_count', labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, **sections):
+        """Atomically writes the JSON summary (and the Prometheus file if configured)."""
+        for path, text in ((self.metrics_file, lambda: json.dumps(self.summary(**sections), indent=2)),
+                           (self.prometheus_file, self.prometheus_text)):
+            if not path:
+                continue
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(text())
+            os.replace(path + ".tmp", path)
@@ -0,0 +1,98 @@
+import csv
+import os
+import queue
+import threading
+import time
+
+BATCH_SIZE = 500  # Rows buffered before a write
+FLUSH_INTERVAL = 5.0  # Seconds before a partial batch is written anyway
+
+
+class CsvSink:
+    """Buffered, thread-safe appender for one CSV file.
+
+    Any thread may call write(); rows go through a queue to a single writer thread
+    that keeps the file open and writes them in batches, once BATCH_SIZE rows are
+    waiting or FLUSH_INTERVAL seconds have passed. close() writes everything that
+    is left. The header is only written when the file is new or empty. If the
+    writer thread fails (e.g. an I/O error), write(), flush() and close() raise its
+    exception instead of waiting for it.
+    """
+
+    def __init__(self, filename, fieldnames, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.filename = filename
+        self.fieldnames = fieldnames
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.queue = queue.Queue()
+        self.closed = False
+        self.error = None  # Exception that stopped the writer thread
+        self.thread = threading.Thread(target=self._run, name=f"CsvSink({os.path.basename(filename)})", daemon=True)
+        self.thread.start()
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise RuntimeError(f"writer of {self.filename} failed: {self.error}") from self.error
+
+    def write(self, row):
+        self._raise_error()
+        if self.closed:
+            raise ValueError(f"write to closed sink {self.filename}")
+        self.queue.put(row)
+
+    def flush(self):
+        """Blocks until every row written so far is on disk."""
+        done = threading.Event()
+        self.queue.put(done)
+        while not done.wait(timeout=1.0) and self.thread.is_alive():
+            pass
+        self._raise_error()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+        self._raise_error()
+
+    def _run(self):
+        try:
+            self._write_rows()
+        except Exception as e:
+            self.error = e
+
+    def _write_rows(self):
+        directory = os.path.dirname(self.filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        needs_header = not os.path.exists(self.filename) or os.path.getsize(self.filename) == 0
+        with open(self.filename, mode="a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+            if needs_header:
+                writer.writeheader()
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    item = False  # Flush interval elapsed
+
+                if isinstance(item, dict):
+                    batch.append(item)
+                    if len(batch) < self.batch_size:
+                        continue
+
+                if batch:
+                    writer.writerows(batch)
+                    self.rows_written += len(batch)
+                    batch = []
+                f.flush()
+                deadline = time.monotonic() + self.flush_interval
+
+                if isinstance(item, threading.Event):
+                    item.set()
+                elif item is None:
+                    return
@@ -0,0 +1,130 @@
+import heapq
+import itertools
+import time
+
+# Priority weights: every term is scaled to 0..1 (the leaderboard bonus to 1..2)
+LEADERBOARD_SIZE = 500  # Ranks beyond this get the smallest leaderboard bonus
+SCORE_SCALE = 6000  # Rank score that counts as the top of the ladder
+STALE_AFTER = 6 * 60 * 60  # Seconds after which a player is fully due for a refresh
+MATCH_FRESH_FOR = 7 * 24 * 60 * 60  # Matches older than this get no recency bonus
+
+
+def player_priority(rank=None, score=None, last_seen=None, now=None):
+    """Returns how valuable fetching a player is (higher is fetched first).
+
+    Combines the leaderboard rank, the player's last known rank score and how long
+    ago we last fetched them (never fetched counts as fully stale).
+    """
+    now = time.time() if now is None else now
+    value = 0.0
+    if rank:
+        value += 2.0 - min(int(rank), LEADERBOARD_SIZE) / LEADERBOARD_SIZE
+    if score:
+        value += min(max(float(score), 0.0), SCORE_SCALE) / SCORE_SCALE
+    if last_seen is None:
+        value += 1.0
+    else:
+        value += min(max(now - last_seen, 0.0) / STALE_AFTER, 1.0)
+    return value
+
+
+def match_priority(parent_priority, match_timestamp=None, now=None):
+    """Returns how valuable fetching a match is: its discoverer's priority plus a bonus for recent matches."""
+    now = time.time() if now is None else now
+    value = parent_priority
+    try:
+        age = now - float(match_timestamp)
+    except (TypeError, ValueError):
+        return value
+    return value + max(0.0, 1.0 - max(age, 0.0) / MATCH_FRESH_FOR)
+
+
+class CrawlBudget:
+    """Caps a crawl by number of requests and/or wall-clock seconds (None means unlimited)."""
+
+    def __init__(self, max_requests=None, max_seconds=None):
+        self.max_requests = max_requests
+        self.max_seconds = max_seconds
+        self.started = time.monotonic()
+        self.requests = 0
+
+    def spend(self, requests=1):
+        self.requests += requests
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def exhausted(self):
+        if self.max_requests is not None and self.requests >= self.max_requests:
+            return True
+        if self.max_seconds is not None and self.elapsed() >= self.max_seconds:
+            return True
+        return False
+
+    def __str__(self):
+        limit_requests = "∞" if self.max_requests is None else self.max_requests
+        limit_seconds = "∞" if self.max_seconds is None else f"{self.max_seconds:.0f}s"
+        return f"{self.requests}/{limit_requests} requests, {self.elapsed():.0f}s/{limit_seconds}"
+
+
+class Frontier:
+    """Pending player and match fetches, kept in priority queues.
+
+    Items are (kind, uid, context) tuples. pop() returns the most valuable item of
+    any queue; equal priorities come out in insertion order, so the crawl is
+    breadth-first within a priority level. Player-update triggers have their own
+    queue so the crawler can stop popping them (see pop's include_updates), and an
+    item pushed with not_before waits in a delayed queue until that time.
+    """
+
+    def __init__(self):
+        self.players = []
+        self.matches = []
+        self.updates = []
+        self.delayed = []  # (not_before, counter, -priority, kind, uid, context)
+        self.counter = itertools.count()
+
+    def push_player(self, kind, uid, priority, context=None, not_before=None):
+        if not_before is not None and not_before > time.time():
+            heapq.heappush(self.delayed, (not_before, next(self.counter), -priority, kind, uid, context))
+            return
+        queue = self.updates if kind == "update" else self.players
+        heapq.heappush(queue, (-priority, next(self.counter), kind, uid, context))
+
+    def push_match(self, uid, priority, context=None):
+        heapq.heappush(self.matches, (-priority, next(self.counter), "match", uid, context))
+
+    def _release_due(self, now):
+        while self.delayed and self.delayed[0][0] <= now:
+            _, _, neg_priority, kind, uid, context = heapq.heappop(self.delayed)
+            self.push_player(kind, uid, -neg_priority, context)
+
+    def next_due(self, now=None):
+        """Time the first delayed item that is not due yet becomes available, or None.
+
+        Items already due are moved to their queue first, so the time returned is in
+        the future and a caller waiting for it never wakes up to the same time again.
+        """
+        self._release_due(time.time() if now is None else now)
+        return self.delayed[0][0] if self.delayed else None
+
+    def pop(self, include_updates=True, now=None):
+        """Returns (priority, kind, uid, context) of the most valuable available item, or None."""
+        self._release_due(time.time() if now is None else now)
+        queues = [queue for queue in (self.players, self.matches, self.updates if include_updates else None) if queue]
+        if not queues:
+            return None
+        neg_priority, _, kind, uid, context = heapq.heappop(min(queues, key=lambda queue: queue[0]))
+        return -neg_priority, kind, uid, context
+
+    def pending(self):
+        """Returns every pending item as (priority, kind, uid, context), most valuable first."""
+        items = self.players + self.matches + self.updates
+        items += [(neg_priority, counter, kind, uid, context) for _, counter, neg_priority, kind, uid, context in self.delayed]
+        return [(-neg_priority, kind, uid, context) for neg_priority, _, kind, uid, context in sorted(items)]
+
+    def __len__(self):
+        return len(self.players) + len(self.matches) + len(self.updates) + len(self.delayed)
+
+    def __bool__(self):
+        return len(self) > 0
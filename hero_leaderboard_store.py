@@ -0,0 +1,143 @@
+import argparse
+import glob
+import os
+import re
+import time
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Hive-partitioned dataset: data/historical/heroes/leaderboard_dataset/hero_slug=thor/date=2025-02-03/part-*.parquet
+HERO_LEADERBOARD_DIR = "data/historical/heroes/leaderboard_dataset/"
+HERO_LEADERBOARD_CSV_DIR = "data/historical/heroes/leaderboard/"
+PLAYTIME_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*([dhms])")
+PLAYTIME_UNITS = {"d": 86400, "h": 3600, "m": 60, "s": 1}
+
+# Same columns as the per-hero CSVs, with ranked_playtime stored in seconds
+HERO_LEADERBOARD_SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("us")),
+    ("rank", pa.int32()),
+    ("player_name", pa.string()),
+    ("score", pa.int32()),
+    ("matches", pa.int32()),
+    ("player_id", pa.int64()),
+    ("ranked_matches", pa.int32()),
+    ("ranked_wins", pa.int32()),
+    ("ranked_mvps", pa.int32()),
+    ("ranked_svps", pa.int32()),
+    ("ranked_kills", pa.int64()),
+    ("ranked_deaths", pa.int64()),
+    ("ranked_assists", pa.int64()),
+    ("ranked_damage_given", pa.float64()),
+    ("ranked_damage_received", pa.float64()),
+    ("ranked_heal", pa.float64()),
+    ("ranked_playtime", pa.int64()),
+    ("matchup_matches", pa.int32()),
+    ("matchup_wins", pa.int32()),
+])
+PARTITIONING = ds.partitioning(pa.schema([("hero_slug", pa.string()), ("date", pa.string())]), flavor="hive")
+WRITE_OPTIONS = ds.ParquetFileFormat().make_write_options(compression="zstd")
+
+
+def parse_playtime(value):
+    """Converts playtime text like '5h 37m 9s' to seconds (plain numbers are taken as seconds)."""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    parts = PLAYTIME_PATTERN.findall(str(value))
+    if not parts:
+        try:
+            return int(float(value))
+        except ValueError:
+            return 0
+    return int(sum(float(amount) * PLAYTIME_UNITS[unit] for amount, unit in parts))
+
+
+def _to_table(df):
+    """Converts CSV-shaped rows (strings or numbers) to the typed schema plus the partition columns."""
+    df = df.copy()
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce", format="ISO8601")
+    df["ranked_playtime"] = df["ranked_playtime"].map(parse_playtime)
+    for field in HERO_LEADERBOARD_SCHEMA:
+        if field.name in ("timestamp", "player_name", "ranked_playtime"):
+            continue
+        df[field.name] = pd.to_numeric(df[field.name], errors="coerce")
+    table = pa.Table.from_pandas(df[HERO_LEADERBOARD_SCHEMA.names], preserve_index=False, safe=False)
+    table = table.cast(HERO_LEADERBOARD_SCHEMA, safe=False)
+    table = table.append_column("hero_slug", pa.array(df["hero_slug"].astype(str), type=pa.string()))
+    return table.append_column("date", pa.array(df["timestamp"].dt.strftime("%Y-%m-%d").fillna("unknown"), type=pa.string()))
+
+
+def append_hero_leaderboard(df, directory=HERO_LEADERBOARD_DIR, basename=None):
+    """Writes rows as new zstd-compressed files in their hero_slug/date partitions.
+
+    Returns the paths of the files written.
+    """
+    if df.empty:
+        return []
+    basename = basename or f"part-{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    written = []
+    ds.write_dataset(
+        _to_table(df),
+        directory,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=f"{basename}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=WRITE_OPTIONS,
+        max_partitions=100_000,
+        file_visitor=lambda written_file: written.append(written_file.path),
+    )
+    return written
+
+
+def read_hero_leaderboard(hero_slug=None, since=None, columns=None, directory=HERO_LEADERBOARD_DIR):
+    """Loads the history of one hero (or all), optionally only from date `since` (YYYY-MM-DD) on.
+
+    Only the matching partitions are opened.
+    """
+    dataset = ds.dataset(directory, format="parquet", partitioning=PARTITIONING)
+    condition = None
+    if hero_slug is not None:
+        condition = ds.field("hero_slug") == hero_slug
+    if since is not None:
+        date_condition = ds.field("date") >= since
+        condition = date_condition if condition is None else condition & date_condition
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+
+def migrate_csvs(csv_dir=HERO_LEADERBOARD_CSV_DIR, directory=HERO_LEADERBOARD_DIR):
+    """One-time import of the per-hero leaderboard CSVs.
+
+    Dates that already have a partition for a hero are skipped, so this is safe to
+    re-run and never duplicates rows written by merge_hero_leaderboard.py.
+    """
+    total = 0
+    for path in sorted(glob.glob(os.path.join(csv_dir, "*.csv"))):
+        hero_slug = os.path.splitext(os.path.basename(path))[0]
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        if df.empty:
+            continue
+        df["hero_slug"] = hero_slug
+        dates = pd.to_datetime(df["timestamp"], errors="coerce", format="ISO8601").dt.strftime("%Y-%m-%d").fillna("unknown")
+        existing = {os.path.basename(p).split("=", 1)[1] for p in glob.glob(os.path.join(directory, f"hero_slug={hero_slug}", "date=*"))}
+        df = df[~dates.isin(existing)]
+        if df.empty:
+            continue
+        append_hero_leaderboard(df, directory, basename="part-0000000000-migrated")
+        total += len(df)
+        print(f"Migrated {len(df)} rows of {path}")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintenance for the partitioned hero leaderboard dataset.")
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("--csv-dir", default=HERO_LEADERBOARD_CSV_DIR,
+                        help=f"directory with the per-hero CSVs (default {HERO_LEADERBOARD_CSV_DIR})")
+    args = parser.parse_args()
+
+    rows = migrate_csvs(args.csv_dir)
+    print(f"✅ Migrated {rows} hero leaderboard rows into {HERO_LEADERBOARD_DIR}.")
@@ -0,0 +1,191 @@
+import argparse
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from match_players_store import (MATCH_PLAYERS_DIR, MATCH_PLAYER_HEROES_DIR, MATCH_PLAYERS_SCHEMA,
+                                 MATCH_PLAYER_HEROES_SCHEMA, partition_files)
+
+HERO_MATRICES_FILE = "data/historical/hero_matrices.npz"
+MIN_PLAYTIME = 30  # Seconds; shorter swaps are ignored, like in MarvelRivalsData.Rmd
+
+# Every matrix is indexed [hero_ids.index(a), hero_ids.index(b)].
+# synergy_*: a and b on the same team (symmetric); counter_*: a's team against b's team.
+# *_matches / *_wins are plain counts, *_weighted_* weigh each pair by the product of
+# both heroes' share of their player's playtime (the Rmd's weighted_win / weighted_loss).
+COUNT_MATRICES = ("synergy_matches", "synergy_wins", "counter_matches", "counter_wins")
+WEIGHTED_MATRICES = ("synergy_weighted_wins", "synergy_weighted_losses",
+                     "counter_weighted_wins", "counter_weighted_losses")
+
+
+def match_hash(match_uid):
+    return int.from_bytes(hashlib.blake2b(str(match_uid).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class HeroMatrices:
+    """Hero synergy (same team) and counter (opposing team) matrices, updated incrementally.
+
+    The matrices live in one .npz file next to the list of match_player_heroes files
+    already folded in and the hashes of the matches they held. update() only reads
+    files not in that list; because compaction rewrites a partition under a new file
+    name, matches seen before are skipped by hash so nothing is counted twice.
+    """
+
+    def __init__(self, path=HERO_MATRICES_FILE):
+        self.path = path
+        self.hero_ids = np.zeros(0, dtype=np.int64)
+        self.matrices = {name: np.zeros((0, 0), dtype=np.int64) for name in COUNT_MATRICES}
+        self.matrices.update({name: np.zeros((0, 0), dtype=np.float64) for name in WEIGHTED_MATRICES})
+        self.processed_files = set()
+        self.processed_matches = np.zeros(0, dtype=np.uint64)  # Sorted
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with np.load(self.path, allow_pickle=False) as saved:
+            self.hero_ids = saved["hero_ids"]
+            for name in self.matrices:
+                self.matrices[name] = saved[name]
+            self.processed_files = set(saved["processed_files"].tolist())
+            self.processed_matches = saved["processed_matches"]
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                hero_ids=self.hero_ids,
+                processed_files=np.array(sorted(self.processed_files), dtype=str),
+                processed_matches=self.processed_matches,
+                **self.matrices,
+            )
+        os.replace(tmp_path, self.path)
+
+    def __getitem__(self, name):
+        return self.matrices[name]
+
+    def index(self, hero_ids):
+        """Matrix positions of hero_ids, growing the matrices for heroes not seen before."""
+        hero_ids = np.asarray(hero_ids, dtype=np.int64)
+        unseen = np.setdiff1d(hero_ids, self.hero_ids)
+        if len(unseen):
+            merged = np.union1d(self.hero_ids, unseen)
+            old_positions = np.searchsorted(merged, self.hero_ids)
+            for name, matrix in self.matrices.items():
+                grown = np.zeros((len(merged), len(merged)), dtype=matrix.dtype)
+                grown[np.ix_(old_positions, old_positions)] = matrix
+                self.matrices[name] = grown
+            self.hero_ids = merged
+        return np.searchsorted(self.hero_ids, hero_ids)
+
+    def _add(self, name, rows, columns, values):
+        np.add.at(self.matrices[name], (rows, columns), values)
+
+    def add_matches(self, heroes):
+        """Folds match_player_heroes rows (with the player's is_win) into the matrices.
+
+        Matches already counted are skipped. Returns the number of matches added.
+        """
+        heroes = heroes.drop_duplicates(subset=["match_uid", "player_uid", "hero_id"], keep="last")
+        hashes = heroes["match_uid"].map(match_hash).to_numpy(dtype=np.uint64)
+        fresh = ~np.isin(hashes, self.processed_matches)
+        heroes = heroes[fresh & (heroes["playtime"] >= MIN_PLAYTIME).to_numpy()].copy()
+        new_matches = np.unique(hashes[fresh])
+        self.processed_matches = np.union1d(self.processed_matches, new_matches)
+
+        # Draws (nobody won) have no winning or losing side
+        heroes = heroes[heroes.groupby("match_uid")["is_win"].transform("any")]
+        if heroes.empty:
+            return len(new_matches)
+        heroes["share"] = heroes["playtime"] / heroes.groupby(["match_uid", "player_uid"])["playtime"].transform("sum")
+
+        # One entry per hero per team; a hero played by two teammates keeps the larger share
+        teams = heroes.groupby(["match_uid", "is_win", "hero_id"], as_index=False)["share"].max()
+        teams["position"] = self.index(teams["hero_id"])
+
+        pairs = teams.merge(teams, on=["match_uid", "is_win"], suffixes=("_a", "_b"))
+        pairs = pairs[pairs["position_a"] != pairs["position_b"]]
+        a, b = pairs["position_a"].to_numpy(), pairs["position_b"].to_numpy()
+        won = pairs["is_win"].to_numpy(dtype=bool)
+        weight = (pairs["share_a"] * pairs["share_b"]).to_numpy()
+        self._add("synergy_matches", a, b, 1)
+        self._add("synergy_wins", a[won], b[won], 1)
+        self._add("synergy_weighted_wins", a[won], b[won], weight[won])
+        self._add("synergy_weighted_losses", a[~won], b[~won], weight[~won])
+
+        opponents = teams.merge(teams, on="match_uid", suffixes=("_a", "_b"))
+        opponents = opponents[(opponents["is_win_a"] != opponents["is_win_b"])
+                              & (opponents["position_a"] != opponents["position_b"])]
+        a, b = opponents["position_a"].to_numpy(), opponents["position_b"].to_numpy()
+        won = opponents["is_win_a"].to_numpy(dtype=bool)
+        weight = (opponents["share_a"] * opponents["share_b"]).to_numpy()
+        self._add("counter_matches", a, b, 1)
+        self._add("counter_wins", a[won], b[won], 1)
+        self._add("counter_weighted_wins", a[won], b[won], weight[won])
+        self._add("counter_weighted_losses", a[~won], b[~won], weight[~won])
+        return len(new_matches)
+
+    def update(self, heroes_directory=MATCH_PLAYER_HEROES_DIR, players_directory=MATCH_PLAYERS_DIR):
+        """Reads the match_player_heroes files written since the last update and adds their matches.
+
+        Returns the number of new matches.
+        """
+        current = partition_files(heroes_directory)
+        added = 0
+        for partition, files in sorted(current.items()):
+            new_files = [path for path in files if os.path.relpath(path, heroes_directory) not in self.processed_files]
+            if not new_files:
+                continue
+            heroes = ds.dataset(new_files, format="parquet", schema=MATCH_PLAYER_HEROES_SCHEMA).to_table(
+                columns=["match_uid", "player_uid", "hero_id", "playtime"]).to_pandas()
+            added += self.add_matches(heroes.merge(
+                self._load_wins(os.path.relpath(partition, heroes_directory), heroes["match_uid"].unique(), players_directory),
+                on=["match_uid", "player_uid"],
+            ))
+        self.processed_files = {os.path.relpath(path, heroes_directory) for files in current.values() for path in files}
+        return added
+
+    @staticmethod
+    def _load_wins(partition, match_uids, players_directory):
+        """is_win of every player of the given matches, from the same year/week partition of match_players."""
+        files = partition_files(players_directory).get(os.path.join(players_directory, partition), [])
+        if not files:
+            return pd.DataFrame(columns=["match_uid", "player_uid", "is_win"])
+        table = ds.dataset(files, format="parquet", schema=MATCH_PLAYERS_SCHEMA).to_table(
+            columns=["match_uid", "player_uid", "is_win"],
+            filter=ds.field("match_uid").isin(pa.array(match_uids, type=pa.string())),
+        )
+        return table.to_pandas().drop_duplicates(subset=["match_uid", "player_uid"], keep="last")
+
+    def frame(self, kind):
+        """Long table of one kind ("synergy" or "counter"): hero_id, other_hero_id, counts, weighted wins/losses, win_rate."""
+        a, b = np.nonzero(self.matrices[f"{kind}_matches"])
+        df = pd.DataFrame({"hero_id": self.hero_ids[a], "other_hero_id": self.hero_ids[b]})
+        for name in ("matches", "wins", "weighted_wins", "weighted_losses"):
+            df[name] = self.matrices[f"{kind}_{name}"][a, b]
+        total = df["weighted_wins"] + df["weighted_losses"]
+        df["win_rate"] = np.where(total > 0, df["weighted_wins"] / total.where(total > 0, 1) * 100, np.nan)
+        return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hero synergy and counter matrices from the match_players datasets.")
+    parser.add_argument("command", choices=["update", "rebuild", "stats"])
+    parser.add_argument("--file", default=HERO_MATRICES_FILE, help=f"matrix file (default {HERO_MATRICES_FILE})")
+    args = parser.parse_args()
+
+    if args.command == "rebuild" and os.path.exists(args.file):
+        os.remove(args.file)
+    matrices = HeroMatrices(args.file)
+    if args.command in ("update", "rebuild"):
+        added = matrices.update()
+        matrices.save()
+        print(f"✅ Added {added} matches to {args.file}.")
+    print(f"{len(matrices.hero_ids)} heroes, {len(matrices.processed_matches)} matches, "
+          f"{len(matrices.processed_files)} files, {int(matrices['synergy_matches'].sum()) // 2} teammate pairs, "
+          f"{int(matrices['counter_matches'].sum())} opponent pairs")
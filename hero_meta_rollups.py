@@ -0,0 +1,241 @@
+import argparse
+import glob
+import io
+import json
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Raw history appended by merge_hero_leaderboard.py: one CSV per hero
+META_DIR = "data/historical/heroes/meta"
+# Hive-partitioned rollups: data/historical/heroes/meta_rollups/granularity=daily/period=2025-02-03/rollup.parquet
+ROLLUP_DIR = "data/historical/heroes/meta_rollups"
+# Bytes of every meta CSV already folded into the rollups
+STATE_FILE = "_state.json"
+ROLLUP_FILE = "rollup.parquet"
+
+META_HEADERS = ["timestamp", "hero_slug", "platform", "mode", "rank", "appearance_rate", "win_rate"]
+KEY_COLUMNS = ["hero_slug", "platform", "mode", "rank"]
+METRICS = ["appearance_rate", "win_rate"]
+GRANULARITIES = ("daily", "weekly")  # A weekly period starts on Monday
+
+# Per metric the partition keeps mergeable stats (sum, min, max, first, last) plus
+# the derived mean, delta (last - first within the period) and change (mean minus
+# the previous period's mean), so dashboards never touch the raw rows.
+ROLLUP_SCHEMA = pa.schema(
+    [(column, pa.string()) for column in KEY_COLUMNS]
+    + [("samples", pa.int64()), ("first_at", pa.timestamp("us")), ("last_at", pa.timestamp("us"))]
+    + [(f"{metric}_{stat}", pa.float64()) for metric in METRICS
+       for stat in ("sum", "min", "max", "first", "last", "mean", "delta", "change")]
+)
+
+
+def _period_starts(timestamps, granularity):
+    days = timestamps.dt.normalize()
+    if granularity == "weekly":
+        days = days - pd.to_timedelta(days.dt.weekday, unit="D")
+    return days.dt.strftime("%Y-%m-%d")
+
+
+def _shift_period(period, granularity, steps):
+    """Start of the period `steps` periods after (or before, if negative) the given one."""
+    step = pd.Timedelta(days=7 if granularity == "weekly" else 1)
+    return (pd.Timestamp(period) + steps * step).strftime("%Y-%m-%d")
+
+
+def _partition_path(directory, granularity, period):
+    return os.path.join(directory, f"granularity={granularity}", f"period={period}", ROLLUP_FILE)
+
+
+def _read_partition(directory, granularity, period):
+    path = _partition_path(directory, granularity, period)
+    if not os.path.exists(path):
+        return None
+    return pq.read_table(path, schema=ROLLUP_SCHEMA).to_pandas()
+
+
+def _write_partition(directory, granularity, period, df):
+    path = _partition_path(directory, granularity, period)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(df[ROLLUP_SCHEMA.names], preserve_index=False, safe=False).cast(ROLLUP_SCHEMA, safe=False)
+    pq.write_table(table, path + ".tmp", compression="zstd")
+    os.replace(path + ".tmp", path)
+
+
+def _summarize(rows):
+    """Mergeable per-key stats of raw rows (timestamp, keys, metrics) or of earlier summaries."""
+    by_first = rows.sort_values("first_at", kind="stable").groupby(KEY_COLUMNS, sort=False)
+    summary = by_first.agg(
+        samples=("samples", "sum"),
+        first_at=("first_at", "min"),
+        **{f"{metric}_sum": (f"{metric}_sum", "sum") for metric in METRICS},
+        **{f"{metric}_min": (f"{metric}_min", "min") for metric in METRICS},
+        **{f"{metric}_max": (f"{metric}_max", "max") for metric in METRICS},
+        **{f"{metric}_first": (f"{metric}_first", "first") for metric in METRICS},
+    )
+    by_last = rows.sort_values("last_at", kind="stable").groupby(KEY_COLUMNS, sort=False)
+    summary = summary.join(by_last.agg(
+        last_at=("last_at", "max"),
+        **{f"{metric}_last": (f"{metric}_last", "last") for metric in METRICS},
+    ))
+    for metric in METRICS:
+        summary[f"{metric}_mean"] = summary[f"{metric}_sum"] / summary["samples"]
+        summary[f"{metric}_delta"] = summary[f"{metric}_last"] - summary[f"{metric}_first"]
+    return summary.reset_index()
+
+
+def _as_partial(rows):
+    """Shapes raw meta rows like a summary with one sample each, so both merge the same way."""
+    partial = rows[KEY_COLUMNS].copy()
+    partial["samples"] = 1
+    partial["first_at"] = partial["last_at"] = rows["timestamp"]
+    for metric in METRICS:
+        for stat in ("sum", "min", "max", "first", "last"):
+            partial[f"{metric}_{stat}"] = rows[metric]
+    return partial
+
+
+def _add_change(df, previous):
+    """Sets <metric>_change from the same key's mean in the previous period (NaN if it has none)."""
+    if previous is None:
+        for metric in METRICS:
+            df[f"{metric}_change"] = float("nan")
+        return df
+    means = previous[KEY_COLUMNS + [f"{metric}_mean" for metric in METRICS]]
+    df = df.drop(columns=[f"{metric}_change" for metric in METRICS], errors="ignore")
+    df = df.merge(means, on=KEY_COLUMNS, how="left", suffixes=("", "_previous"))
+    for metric in METRICS:
+        df[f"{metric}_change"] = df[f"{metric}_mean"] - df.pop(f"{metric}_mean_previous")
+    return df
+
+
+def _read_new_rows(meta_dir, offsets):
+    """Reads the rows appended to each meta CSV since its recorded offset.
+
+    Returns (rows, new offsets). Only complete lines are consumed; a CSV shorter
+    than its offset was rewritten elsewhere and raises ValueError (run rebuild).
+    """
+    frames = []
+    offsets = dict(offsets)
+    for path in sorted(glob.glob(os.path.join(meta_dir, "*.csv"))):
+        name = os.path.basename(path)
+        offset = offsets.get(name, 0)
+        size = os.path.getsize(path)
+        if size < offset:
+            raise ValueError(f"{path} is shorter than its rolled-up offset")
+        if size == offset:
+            continue
+        with open(path, "rb") as f:
+            f.seek(offset)
+            chunk = f.read()
+        chunk = chunk[:chunk.rfind(b"\n") + 1]
+        if not chunk:
+            continue
+        frame = pd.read_csv(io.BytesIO(chunk), header=0 if offset == 0 else None, names=META_HEADERS, dtype=str)
+        if offset == 0:
+            frame = frame[frame["timestamp"] != "timestamp"]
+        frames.append(frame)
+        offsets[name] = offset + len(chunk)
+    if not frames:
+        return pd.DataFrame(columns=META_HEADERS), offsets
+
+    rows = pd.concat(frames, ignore_index=True)
+    rows["timestamp"] = pd.to_datetime(rows["timestamp"], errors="coerce", format="ISO8601")
+    for metric in METRICS:
+        rows[metric] = pd.to_numeric(rows[metric], errors="coerce")
+    return rows.dropna(subset=["timestamp"]), offsets
+
+
+def _load_state(directory):
+    path = os.path.join(directory, STATE_FILE)
+    if not os.path.exists(path):
+        return {"offsets": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_state(directory, state):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def update_rollups(meta_dir=META_DIR, directory=ROLLUP_DIR):
+    """Folds the meta rows appended since the last update into the daily and weekly rollups.
+
+    Only the partitions of periods that received rows are rewritten (plus the
+    period after each, whose change column depends on it). Returns the number of
+    partitions written.
+    """
+    state = _load_state(directory)
+    rows, offsets = _read_new_rows(meta_dir, state["offsets"])
+    written = 0
+    if not rows.empty:
+        for granularity in GRANULARITIES:
+            rows["period"] = _period_starts(rows["timestamp"], granularity)
+            touched = sorted(rows["period"].unique())
+            for period, period_rows in rows.groupby("period", sort=True):
+                partial = _as_partial(period_rows)
+                existing = _read_partition(directory, granularity, period)
+                if existing is not None:
+                    partial = pd.concat([existing[partial.columns], partial], ignore_index=True)
+                rollup = _summarize(partial)
+                previous = _read_partition(directory, granularity, _shift_period(period, granularity, -1))
+                _write_partition(directory, granularity, period, _add_change(rollup, previous))
+                written += 1
+
+            # A backfilled period shifts the change column of the period after it
+            for period in touched:
+                following = _shift_period(period, granularity, 1)
+                next_rollup = _read_partition(directory, granularity, following)
+                if following in touched or next_rollup is None:
+                    continue
+                _write_partition(directory, granularity, following,
+                                 _add_change(next_rollup, _read_partition(directory, granularity, period)))
+                written += 1
+    # Offsets are saved last: a crash before this re-reads the same rows, so run rebuild after one
+    state["offsets"] = offsets
+    _save_state(directory, state)
+    return written
+
+
+def rebuild_rollups(meta_dir=META_DIR, directory=ROLLUP_DIR):
+    """Drops the rollups and recomputes them from every meta CSV."""
+    for granularity in GRANULARITIES:
+        shutil.rmtree(os.path.join(directory, f"granularity={granularity}"), ignore_errors=True)
+    _save_state(directory, {"offsets": {}})
+    return update_rollups(meta_dir, directory)
+
+
+def read_rollups(granularity="daily", hero_slug=None, since=None, directory=ROLLUP_DIR):
+    """Loads the rollups of one granularity, optionally for one hero and from period `since` (YYYY-MM-DD) on."""
+    if not os.path.isdir(os.path.join(directory, f"granularity={granularity}")):
+        return pd.DataFrame(columns=["period"] + ROLLUP_SCHEMA.names)
+    dataset = ds.dataset(os.path.join(directory, f"granularity={granularity}"), format="parquet",
+                         partitioning=ds.partitioning(pa.schema([("period", pa.string())]), flavor="hive"))
+    condition = None
+    if hero_slug is not None:
+        condition = ds.field("hero_slug") == hero_slug
+    if since is not None:
+        period_condition = ds.field("period") >= since
+        condition = period_condition if condition is None else condition & period_condition
+    return dataset.to_table(filter=condition).to_pandas()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Daily and weekly rollups of the hero meta history.")
+    parser.add_argument("command", choices=["update", "rebuild"])
+    parser.add_argument("--meta-dir", default=META_DIR, help=f"directory with the per-hero meta CSVs (default {META_DIR})")
+    parser.add_argument("--dir", default=ROLLUP_DIR, help=f"rollup dataset directory (default {ROLLUP_DIR})")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        partitions = rebuild_rollups(args.meta_dir, args.dir)
+    else:
+        partitions = update_rollups(args.meta_dir, args.dir)
+    print(f"✅ Wrote {partitions} hero meta rollup partitions to {args.dir}.")
@@ -0,0 +1,116 @@
+import csv
+import hashlib
+import json
+import os
+
+INDEX_SUFFIX = ".index.json"
+RECENT_ROWS = 1000  # Rows of each history remembered by their hash
+
+
+def row_hash(row):
+    """Short stable hash of a CSV row (a sequence of strings)."""
+    return hashlib.blake2b("\x1f".join(row).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _order_key(value):
+    """Sort key for a timestamp cell: epoch numbers compare numerically, ISO strings as text."""
+    try:
+        return (0, float(value), "")
+    except (TypeError, ValueError):
+        return (1, 0.0, str(value))
+
+
+class HistoryIndex:
+    """Small sidecar (<csv>.index.json) that finds new rows of an append-only history CSV without reading it.
+
+    It keeps the hashes of the last RECENT_ROWS rows and, for histories with a
+    timestamp column, their oldest timestamp (the low-water mark). A row is new if
+    its hash is not among the recent rows and, once the history is longer than the
+    window, it is not older than the low-water mark. The CSV size is recorded too:
+    if the file changed behind the index's back, the index is rebuilt from it once.
+    The sidecar is only rewritten when its content changes, so a run that adds
+    nothing to a history leaves both files untouched.
+    """
+
+    def __init__(self, csv_path, order_column=None):
+        self.csv_path = csv_path
+        self.path = csv_path + INDEX_SUFFIX
+        self.order_column = order_column
+        self.rows = []  # [hash, timestamp cell] of the most recent rows, oldest first
+        self.full = False  # True once rows older than the window have been dropped
+        self.size = 0
+        self.changed = False  # True when the sidecar on disk is out of date
+        self._load()
+
+    def _load(self):
+        size = os.path.getsize(self.csv_path) if os.path.exists(self.csv_path) else 0
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                try:
+                    saved = json.load(f)
+                except json.JSONDecodeError:
+                    saved = {}
+            if saved.get("size") == size and saved.get("order_column") == self.order_column:
+                self.rows = saved["rows"]
+                self.full = saved["full"]
+                self.size = size
+                return
+        self.rebuild()
+
+    def rebuild(self):
+        """Re-indexes the CSV from scratch (first use, or after the file was changed elsewhere)."""
+        self.rows = []
+        self.full = False
+        if os.path.exists(self.csv_path):
+            with open(self.csv_path, "r", encoding="utf-8") as f:
+                reader = csv.reader(f)
+                next(reader, None)  # Skip header
+                self._remember(row for row in reader if row)
+        self.size = os.path.getsize(self.csv_path) if os.path.exists(self.csv_path) else 0
+        self.changed = True
+
+    def _remember(self, rows):
+        for row in rows:
+            order = row[self.order_column] if self.order_column is not None and self.order_column < len(row) else None
+            self.rows.append([row_hash(row), order])
+        if len(self.rows) > RECENT_ROWS:
+            del self.rows[:-RECENT_ROWS]
+            self.full = True
+
+    def new_rows(self, rows):
+        """Returns the rows (tuples of strings) not in the history yet, in their original order."""
+        seen = {row_hash for row_hash, _ in self.rows}
+        low_water = None
+        if self.full and self.order_column is not None:
+            orders = [_order_key(order) for _, order in self.rows if order is not None]
+            low_water = min(orders) if orders else None
+
+        fresh = []
+        for row in rows:
+            key = row_hash(row)
+            if key in seen:
+                continue
+            if low_water is not None and _order_key(row[self.order_column]) < low_water:
+                continue  # Older than every remembered row, so recorded before the window
+            seen.add(key)
+            fresh.append(row)
+        return fresh
+
+    def add(self, rows):
+        """Records rows just appended to the CSV and saves the sidecar if anything changed."""
+        rows = list(rows)
+        if rows:
+            self._remember(rows)
+            self.changed = True
+        size = os.path.getsize(self.csv_path) if os.path.exists(self.csv_path) else 0
+        if size != self.size:
+            self.size = size
+            self.changed = True
+        if not self.changed:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"size": self.size, "order_column": self.order_column, "full": self.full, "rows": self.rows},
+                      f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self.changed = False
@@ -0,0 +1,251 @@
+import argparse
+import bisect
+import json
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# data/historical/leaderboard_snapshots/index.json lists every snapshot (sorted by
+# timestamp) and the file holding it: a keyframe (the whole leaderboard) or a delta
+# (only what changed since the previous snapshot).
+LEADERBOARD_SNAPSHOTS_DIR = "data/historical/leaderboard_snapshots/"
+LEADERBOARD_CSV = "data/historical/leaderboard.csv"
+INDEX_FILE = "index.json"
+KEYFRAME_EVERY = 28  # Snapshots per keyframe: one week of 6-hourly runs
+
+# Per-player fields of a snapshot, in the order of the bits of a delta's `changed` mask
+FIELDS = ["rank", "player_name", "rank_name", "score", "matches", "rank_score", "is_private"]
+FIELD_TYPES = {
+    "rank": pa.int32(),
+    "player_name": pa.string(),
+    "rank_name": pa.string(),
+    "score": pa.int32(),
+    "matches": pa.int32(),
+    "rank_score": pa.float64(),  # NaN for private profiles
+    "is_private": pa.string(),
+}
+KEYFRAME_SCHEMA = pa.schema([("player_id", pa.int64())] + [(field, FIELD_TYPES[field]) for field in FIELDS])
+# Unchanged fields are null; `changed` says which fields are set, `removed` marks players that left the board
+DELTA_SCHEMA = KEYFRAME_SCHEMA.append(pa.field("changed", pa.int16())).append(pa.field("removed", pa.bool_()))
+
+
+def _normalize(rows):
+    """Snapshot rows (dicts or a DataFrame with the leaderboard CSV columns) as a frame indexed by player_id."""
+    df = pd.DataFrame(rows)
+    df["player_id"] = pd.to_numeric(df["player_id"], errors="coerce")
+    df = df.dropna(subset=["player_id"]).drop_duplicates(subset="player_id", keep="last")
+    for field in FIELDS:
+        if field not in df.columns:
+            df[field] = None
+        if pa.types.is_string(FIELD_TYPES[field]):
+            df[field] = df[field].fillna("").astype(str)
+        else:
+            df[field] = pd.to_numeric(df[field], errors="coerce")
+    df["player_id"] = df["player_id"].astype(np.int64)
+    return df.set_index("player_id")[FIELDS]
+
+
+def _same(a, b):
+    """Elementwise equality where two missing values count as equal."""
+    return (a == b) | (a.isna() & b.isna())
+
+
+def _file_name(kind, timestamp):
+    return f"{kind}-{timestamp.replace(':', '-')}.parquet"
+
+
+class LeaderboardSnapshots:
+    """Leaderboard history stored as periodic keyframes plus per-run deltas keyed by player_id.
+
+    as_of() rebuilds the board at any time from the nearest keyframe before it and
+    the deltas after that keyframe; trajectory() follows one player through a time
+    range, reading only that player's rows of each file (files are sorted by
+    player_id, so Parquet statistics skip the rest).
+    """
+
+    def __init__(self, directory=LEADERBOARD_SNAPSHOTS_DIR, keyframe_every=KEYFRAME_EVERY):
+        self.directory = directory
+        self.keyframe_every = keyframe_every
+        self.entries = []  # [timestamp, "keyframe" | "delta", file name], sorted by timestamp
+        self.timestamps = []
+        self._latest = None  # Board of the newest snapshot, once known
+        path = os.path.join(directory, INDEX_FILE)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)["snapshots"]
+        self.timestamps = [timestamp for timestamp, _, _ in self.entries]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _save_index(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"snapshots": self.entries}, f, indent=1)
+        os.replace(path + ".tmp", path)
+
+    def _read(self, position, player_id=None):
+        _, kind, name = self.entries[position]
+        filters = None if player_id is None else [("player_id", "==", int(player_id))]
+        table = pq.read_table(os.path.join(self.directory, name), filters=filters,
+                              schema=KEYFRAME_SCHEMA if kind == "keyframe" else DELTA_SCHEMA)
+        return kind, table.to_pandas()
+
+    def _keyframe_before(self, position):
+        while self.entries[position][1] != "keyframe":
+            position -= 1
+        return position
+
+    @staticmethod
+    def _apply(board, delta):
+        """Applies one delta frame to a board indexed by player_id."""
+        board = board.drop(index=delta.loc[delta["removed"], "player_id"], errors="ignore")
+        changes = delta[~delta["removed"]].set_index("player_id")
+        board = board.reindex(board.index.union(changes.index))
+        for bit, field in enumerate(FIELDS):
+            rows = changes.index[(changes["changed"].to_numpy() & (1 << bit)) != 0]
+            board.loc[rows, field] = changes.loc[rows, field]
+        return board
+
+    def _board(self, position):
+        start = self._keyframe_before(position)
+        board = self._read(start)[1].set_index("player_id")[FIELDS]
+        for step in range(start + 1, position + 1):
+            board = self._apply(board, self._read(step)[1])
+        # Players added by deltas turn the integer columns into floats
+        table = pa.Table.from_pandas(board.reset_index(), schema=KEYFRAME_SCHEMA, preserve_index=False)
+        return table.to_pandas().set_index("player_id")
+
+    # ---------------------------
+    # Writing
+    # ---------------------------
+    def append(self, timestamp, rows):
+        """Stores the leaderboard of one run; timestamps must be ISO strings newer than the last snapshot.
+
+        Returns "keyframe" or "delta", whichever was written.
+        """
+        if self.timestamps and timestamp <= self.timestamps[-1]:
+            raise ValueError(f"snapshot {timestamp} is not newer than the last one ({self.timestamps[-1]})")
+        board = _normalize(rows).sort_index()
+        since_keyframe = len(self.entries) - self._keyframe_before(len(self.entries) - 1) if self.entries else None
+
+        if since_keyframe is None or since_keyframe >= self.keyframe_every:
+            kind = "keyframe"
+            table = pa.Table.from_pandas(board.reset_index(), schema=KEYFRAME_SCHEMA, preserve_index=False)
+        else:
+            kind = "delta"
+            table = self._delta(self.latest(), board)
+
+        os.makedirs(self.directory, exist_ok=True)
+        name = _file_name(kind, timestamp)
+        pq.write_table(table, os.path.join(self.directory, name + ".tmp"), compression="zstd")
+        os.replace(os.path.join(self.directory, name + ".tmp"), os.path.join(self.directory, name))
+        self.entries.append([timestamp, kind, name])
+        self.timestamps.append(timestamp)
+        self._save_index()
+        self._latest = board
+        return kind
+
+    @staticmethod
+    def _delta(previous, board):
+        common = board.index.intersection(previous.index)
+        changed = pd.Series(0, index=board.index, dtype=np.int16)
+        for bit, field in enumerate(FIELDS):
+            differs = ~_same(board.loc[common, field], previous.loc[common, field])
+            changed.loc[common[differs.to_numpy()]] |= 1 << bit
+        new = board.index.difference(previous.index)
+        changed.loc[new] = (1 << len(FIELDS)) - 1
+
+        delta = board[changed != 0].copy()
+        mask = changed[changed != 0]
+        for bit, field in enumerate(FIELDS):
+            delta[field] = delta[field].where((mask.to_numpy() & (1 << bit)) != 0, None)
+        delta["changed"] = mask
+        delta["removed"] = False
+        removed = pd.DataFrame({"changed": 0, "removed": True}, index=previous.index.difference(board.index))
+        delta = pd.concat([delta, removed]).rename_axis("player_id").sort_index().reset_index()
+        return pa.Table.from_pandas(delta, schema=DELTA_SCHEMA, preserve_index=False)
+
+    def latest(self):
+        if self._latest is None:
+            self._latest = self._board(len(self.entries) - 1) if self.entries else _normalize([{"player_id": None}])
+        return self._latest
+
+    # ---------------------------
+    # Queries
+    # ---------------------------
+    def as_of(self, timestamp):
+        """The leaderboard of the newest snapshot at or before timestamp (ISO string), ordered by rank."""
+        position = bisect.bisect_right(self.timestamps, timestamp) - 1
+        if position < 0:
+            return pd.DataFrame(columns=["timestamp", "player_id"] + FIELDS)
+        board = self._board(position).reset_index().sort_values(["rank", "player_id"], ignore_index=True)
+        board.insert(0, "timestamp", self.timestamps[position])
+        return board
+
+    def trajectory(self, player_id, since=None, until=None):
+        """One row per snapshot in [since, until] the player was on the board: timestamp plus every field."""
+        first = 0 if since is None else bisect.bisect_left(self.timestamps, since)
+        last = len(self.entries) - 1 if until is None else bisect.bisect_right(self.timestamps, until) - 1
+        if first > last:
+            return pd.DataFrame(columns=["timestamp"] + FIELDS)
+
+        rows = []
+        state = None
+        for position in range(self._keyframe_before(first), last + 1):
+            kind, frame = self._read(position, player_id)
+            if kind == "keyframe":
+                state = frame.iloc[0][FIELDS].to_dict() if len(frame) else None
+            elif len(frame):
+                change = frame.iloc[0]
+                if change["removed"]:
+                    state = None
+                else:
+                    state = dict(state or {})
+                    for bit, field in enumerate(FIELDS):
+                        if int(change["changed"]) & (1 << bit):
+                            state[field] = change[field]
+            if state is not None and position >= first:
+                rows.append(dict(state, timestamp=self.timestamps[position]))
+        return pd.DataFrame(rows, columns=["timestamp"] + FIELDS)
+
+
+def migrate_csv(snapshots, path=LEADERBOARD_CSV, before=None):
+    """Imports the snapshots of leaderboard.csv newer than the last one stored (and older than `before`).
+
+    Returns how many.
+    """
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    imported = 0
+    for timestamp, rows in df.groupby("timestamp", sort=True):
+        if snapshots.timestamps and timestamp <= snapshots.timestamps[-1]:
+            continue
+        if before is not None and timestamp >= before:
+            break
+        snapshots.append(timestamp, rows)
+        imported += 1
+    return imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keyframe + delta storage of the leaderboard history.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate = subparsers.add_parser("migrate", help="import the snapshots of leaderboard.csv")
+    migrate.add_argument("--csv", default=LEADERBOARD_CSV, help=f"leaderboard CSV (default {LEADERBOARD_CSV})")
+    as_of = subparsers.add_parser("as-of", help="print the leaderboard at a time")
+    as_of.add_argument("timestamp", help="ISO timestamp, e.g. 2025-02-20T12:00")
+    trajectory = subparsers.add_parser("trajectory", help="print one player's history")
+    trajectory.add_argument("player_id", type=int)
+    trajectory.add_argument("--since")
+    trajectory.add_argument("--until")
+    args = parser.parse_args()
+
+    snapshots = LeaderboardSnapshots()
+    if args.command == "migrate":
+        print(f"✅ Imported {migrate_csv(snapshots, args.csv)} snapshots into {LEADERBOARD_SNAPSHOTS_DIR}.")
+    elif args.command == "as-of":
+        print(snapshots.as_of(args.timestamp).to_string(index=False))
+    else:
+        print(snapshots.trajectory(args.player_id, args.since, args.until).to_string(index=False))
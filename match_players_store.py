@@ -0,0 +1,192 @@
+import argparse
+import glob
+import json
+import os
+import re
+import time
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Hive-partitioned datasets: data/historical/match_players/year=2025/week=10/part-*.parquet
+MATCH_PLAYERS_DIR = "data/historical/match_players/"
+MATCH_PLAYER_HEROES_DIR = "data/historical/match_player_heroes/"
+LEGACY_FILE_PATTERN = re.compile(r"match_players_(?:week_(\d+)_(\d+)|default)\.parquet$")
+COMPACT_MIN_FILES = 8  # Partitions with fewer files are left alone by compact()
+
+MATCH_PLAYERS_SCHEMA = pa.schema([
+    ("match_uid", pa.string()),
+    ("player_uid", pa.int64()),
+    ("name", pa.string()),
+    ("hero_id", pa.int64()),
+    ("is_win", pa.bool_()),
+    ("kills", pa.int64()),
+    ("deaths", pa.int64()),
+    ("assists", pa.int64()),
+    ("hero_damage", pa.float64()),
+    ("hero_healed", pa.float64()),
+    ("damage_taken", pa.float64()),
+    ("match_timestamp", pa.timestamp("ns")),
+])
+# One row per hero a player played in a match (the old hero_data JSON list)
+MATCH_PLAYER_HEROES_SCHEMA = pa.schema([
+    ("match_uid", pa.string()),
+    ("player_uid", pa.int64()),
+    ("hero_id", pa.int64()),
+    ("playtime", pa.float64()),
+    ("kills", pa.int64()),
+    ("deaths", pa.int64()),
+    ("assists", pa.int64()),
+    ("hit_rate", pa.float64()),
+    ("match_timestamp", pa.timestamp("ns")),
+])
+PARTITIONING = ds.partitioning(pa.schema([("year", pa.int32()), ("week", pa.int32())]), flavor="hive")
+
+# directory -> (schema, dedupe key)
+DATASETS = {
+    MATCH_PLAYERS_DIR: (MATCH_PLAYERS_SCHEMA, ["match_uid", "player_uid"]),
+    MATCH_PLAYER_HEROES_DIR: (MATCH_PLAYER_HEROES_SCHEMA, ["match_uid", "player_uid", "hero_id"]),
+}
+
+
+def _to_table(df, schema):
+    """Converts rows (a DataFrame or an Arrow table) to the dataset schema plus the ISO year/week partition columns."""
+    if isinstance(df, pa.Table):
+        table = df.select(schema.names).cast(schema)
+        timestamps = table.column("match_timestamp")
+        table = table.append_column("year", pc.iso_year(timestamps).cast(pa.int32()))
+        return table.append_column("week", pc.iso_week(timestamps).cast(pa.int32()))
+    timestamps = pd.to_datetime(df["match_timestamp"], errors="coerce")
+    iso = timestamps.dt.isocalendar()
+    table = pa.Table.from_pandas(df[schema.names], preserve_index=False).cast(schema)
+    table = table.append_column("year", pa.array(iso["year"].astype("Int32"), type=pa.int32(), from_pandas=True))
+    return table.append_column("week", pa.array(iso["week"].astype("Int32"), type=pa.int32(), from_pandas=True))
+
+
+def _write_partitioned(df, directory, schema, basename):
+    written = []
+    ds.write_dataset(
+        _to_table(df, schema),
+        directory,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=f"{basename}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_visitor=lambda written_file: written.append(written_file.path),
+    )
+    return written
+
+
+def append_rows(df, directory, schema):
+    """Appends rows as new files in their year/week partitions; existing files are never read or rewritten.
+
+    Rows (a DataFrame or an Arrow table) without a match timestamp land in the null
+    (__HIVE_DEFAULT_PARTITION__) partition. Returns the paths of the files written.
+    """
+    if not len(df):
+        return []
+    return _write_partitioned(df, directory, schema, f"part-{int(time.time())}-{uuid.uuid4().hex[:8]}")
+
+
+def append_match_players(df, directory=MATCH_PLAYERS_DIR):
+    return append_rows(df, directory, MATCH_PLAYERS_SCHEMA)
+
+
+def append_match_player_heroes(df, directory=MATCH_PLAYER_HEROES_DIR):
+    return append_rows(df, directory, MATCH_PLAYER_HEROES_SCHEMA)
+
+
+def partition_files(directory=MATCH_PLAYERS_DIR):
+    """Returns {partition directory: [parquet files, oldest first]}."""
+    partitions = {}
+    for path in glob.glob(os.path.join(directory, "year=*", "week=*", "*.parquet")):
+        partitions.setdefault(os.path.dirname(path), []).append(path)
+    # File names start with the unix time of the run that wrote them
+    return {partition: sorted(files) for partition, files in partitions.items()}
+
+
+def explode_hero_data(df):
+    """Turns the legacy double-quoted hero_data JSON column into match_player_heroes rows."""
+    rows = []
+    for match_uid, player_uid, hero_data, match_timestamp in df[["match_uid", "player_uid", "hero_data", "match_timestamp"]].itertuples(index=False):
+        if not isinstance(hero_data, str) or not hero_data.strip('"'):
+            continue
+        for hero in json.loads(hero_data.strip('"')):
+            rows.append(dict(hero, match_uid=match_uid, player_uid=player_uid, match_timestamp=match_timestamp))
+    return pd.DataFrame(rows, columns=MATCH_PLAYER_HEROES_SCHEMA.names)
+
+
+def migrate_legacy_files(directory=MATCH_PLAYERS_DIR, heroes_directory=MATCH_PLAYER_HEROES_DIR):
+    """Moves the old match_players_week_{week}_{year}.parquet files into the partitioned layout,
+    splitting their hero_data JSON strings out into the match_player_heroes dataset."""
+    for path in sorted(glob.glob(os.path.join(directory, "match_players_*.parquet"))):
+        if not LEGACY_FILE_PATTERN.search(os.path.basename(path)):
+            continue
+        print(f"Migrating {path} into the partitioned datasets...")
+        df = pd.read_parquet(path, engine="pyarrow")
+        # Legacy files are the oldest data, so they sort before every part-<time> file
+        basename = f"part-0000000000-legacy-{uuid.uuid4().hex[:8]}"
+        _write_partitioned(df, directory, MATCH_PLAYERS_SCHEMA, basename)
+        heroes = explode_hero_data(df)
+        if not heroes.empty:
+            _write_partitioned(heroes, heroes_directory, MATCH_PLAYER_HEROES_SCHEMA, basename)
+        os.remove(path)
+
+
+def compact(directory=MATCH_PLAYERS_DIR, min_files=COMPACT_MIN_FILES):
+    """Merges the small files of each partition into one, deduplicated on the dataset's key.
+
+    The newest row wins, like the old read-concat-rewrite did. Returns the partitions compacted.
+    """
+    schema, key = DATASETS[directory]
+    compacted = []
+    for partition, files in sorted(partition_files(directory).items()):
+        if len(files) < min_files:
+            continue
+        print(f"Compacting {len(files)} files in {partition}...")
+        table = pa.concat_tables([pq.read_table(path, schema=schema) for path in files])
+        df = table.to_pandas()
+        df.drop_duplicates(subset=key, keep="last", inplace=True)
+
+        # Name the result after the newest input so it keeps its place in the file order
+        newest = os.path.basename(files[-1]).split("-")[1]
+        target = os.path.join(partition, f"part-{newest}-compacted-{uuid.uuid4().hex[:8]}.parquet")
+        tmp_target = target + ".tmp"
+        pq.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False), tmp_target)
+        os.replace(tmp_target, target)
+        for path in files:
+            os.remove(path)
+        compacted.append(partition)
+    return compacted
+
+
+def read_dataset(directory, schema, columns=None, filter=None):
+    """Loads a partitioned dataset (optionally only some columns / partitions) as a DataFrame."""
+    files = [path for paths in partition_files(directory).values() for path in paths]
+    schema = schema.append(pa.field("year", pa.int32())).append(pa.field("week", pa.int32()))
+    dataset = ds.dataset(files, format="parquet", schema=schema, partitioning=PARTITIONING, partition_base_dir=directory)
+    return dataset.to_table(columns=columns, filter=filter).to_pandas()
+
+
+def read_match_players(directory=MATCH_PLAYERS_DIR, columns=None, filter=None):
+    return read_dataset(directory, MATCH_PLAYERS_SCHEMA, columns, filter)
+
+
+def read_match_player_heroes(directory=MATCH_PLAYER_HEROES_DIR, columns=None, filter=None):
+    return read_dataset(directory, MATCH_PLAYER_HEROES_SCHEMA, columns, filter)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintenance for the partitioned match_players datasets.")
+    parser.add_argument("command", choices=["compact", "migrate"])
+    parser.add_argument("--min-files", type=int, default=COMPACT_MIN_FILES,
+                        help=f"only compact partitions with at least this many files (default {COMPACT_MIN_FILES})")
+    args = parser.parse_args()
+
+    migrate_legacy_files()
+    if args.command == "compact":
+        partitions = compact(MATCH_PLAYERS_DIR, args.min_files) + compact(MATCH_PLAYER_HEROES_DIR, args.min_files)
+        print(f"✅ Compacted {len(partitions)} partitions.")
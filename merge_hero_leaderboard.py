@@ -2,60 +2,68 @@ import json
 import os
 import sys
 import csv
-import time
+import argparse
 import asyncio
 import aiohttp
-import requests
+from collections import Counter, deque
 from datetime import datetime
+import pandas as pd
+from rate_limiter import RateLimiter, endpoint_name
+from hero_leaderboard_store import append_hero_leaderboard
+from hero_meta_rollups import update_rollups
+from response_cache import ResponseCache
+from api_fixtures import open_recorder
+from api_payloads import loads
 
-# Get hero slug from GitHub Actions job matrix
-hero_slug = sys.argv[1]
-headers = {"x-api-key": os.getenv("API_KEY")}
+headers = {"x-api-key": os.getenv("API_KEY", "")}
+# Where leaderboard rows go: "csv", "parquet" (typed dataset, see hero_leaderboard_store.py) or "both"
+storage = os.getenv("HERO_LEADERBOARD_STORAGE", "both")
+API_LIMIT = 480  # Max API calls per minute is 500 but we do 480 to be safe
+MAX_CONCURRENCY = 20  # Max in-flight player requests, shared by every hero of a run
+PARQUET_BATCH_ROWS = 5000  # Leaderboard rows buffered before a parquet file is written
+# MRAPI_BASE_URL points the script at a replay server, see api_fixtures.py
+PLAYER_API_URL = os.getenv("MRAPI_BASE_URL", "https://mrapi.org/api/") + "player/{}"
+rate_limiter = RateLimiter(API_LIMIT)
+response_cache = ResponseCache()  # Player responses shared with LeaderboardStats.py and earlier runs
+fixture_recorder = open_recorder()  # Records every response when MRAPI_RECORD is set
+private_profile_count = 0
 
 # File paths
-meta_csv = f"data/historical/heroes/meta/{hero_slug}.csv"
-leaderboard_csv = f"data/historical/heroes/leaderboard/{hero_slug}.csv"
+META_DIR = "data/historical/heroes/meta"
+LEADERBOARD_DIR = "data/historical/heroes/leaderboard"
 latest_heroes_file = "data/latest/heroes/all_heroes.json"
-latest_leaderboard_file = f"data/latest/heroes/latest_leaderboard_{hero_slug}.json"
+LATEST_LEADERBOARD_FILE = "data/latest/heroes/latest_leaderboard_{}.json"
+
+meta_headers = ["timestamp", "hero_slug", "platform", "mode", "rank", "appearance_rate", "win_rate"]
+# Leaderboard CSV headers (including extra fields)
+leaderboard_headers = [
+    "timestamp", "hero_slug", "rank", "player_name", "score", "matches", "player_id",
+    "ranked_matches", "ranked_wins", "ranked_mvps", "ranked_svps", "ranked_kills",
+    "ranked_deaths", "ranked_assists", "ranked_damage_given", "ranked_damage_received",
+    "ranked_heal", "ranked_playtime", "matchup_matches", "matchup_wins"
+]
 
-# Ensure historical directory exists
-os.makedirs("data/historical/heroes/meta", exist_ok=True)
-os.makedirs("data/historical/heroes/leaderboard", exist_ok=True)
 
 # Load latest hero data
-if os.path.exists(latest_heroes_file):
+def load_heroes():
+    if not os.path.exists(latest_heroes_file):
+        print(f"⚠️ Error: {latest_heroes_file} not found.")
+        sys.exit(1)
     with open(latest_heroes_file, "r", encoding="utf-8") as f:
-        latest_heroes = json.load(f)
-else:
-    print(f"⚠️ Error: {latest_heroes_file} not found.")
-    sys.exit(1)
-
-# Find the specific hero
-hero_data = next((h for h in latest_heroes if h["slug"] == hero_slug), None)
-if not hero_data:
-    print(f"⚠️ Error: No hero data found for slug {hero_slug}.")
-    sys.exit(1)
-
-# Extract hero ID for API lookups
-hero_id = hero_data.get("id")
-if not hero_id:
-    print(f"⚠️ Error: No hero ID found for {hero_slug}.")
-    sys.exit(1)
+        return json.load(f)
+
 
 # Load latest leaderboard data
-if os.path.exists(latest_leaderboard_file) and os.path.getsize(latest_leaderboard_file) > 0:
+def load_leaderboard(hero_slug):
+    latest_leaderboard_file = LATEST_LEADERBOARD_FILE.format(hero_slug)
+    if not os.path.exists(latest_leaderboard_file) or os.path.getsize(latest_leaderboard_file) == 0:
+        return []
     with open(latest_leaderboard_file, "r", encoding="utf-8") as f:
         try:
-            latest_leaderboard = json.load(f)
+            return json.load(f)
         except json.JSONDecodeError:
             print(f"⚠️ Warning: {latest_leaderboard_file} contains invalid JSON. Defaulting to empty list.")
-            latest_leaderboard = []
-else:
-    latest_leaderboard = []
-
-
-# Get timestamp
-timestamp = datetime.utcnow().isoformat()
+            return []
 
 
 # Ensure CSV has headers
@@ -65,32 +73,34 @@ def ensure_csv_with_headers(file_path, headers):
             writer = csv.writer(f)
             writer.writerow(headers)
 
-# Ensure meta CSV exists with headers
-ensure_csv_with_headers(meta_csv, ["timestamp", "hero_slug", "platform", "mode", "rank", "appearance_rate", "win_rate"])
-
-# Ensure leaderboard CSV exists with headers (including extra fields)
-leaderboard_headers = [
-    "timestamp", "hero_slug", "rank", "player_name", "score", "matches", "player_id",
-    "ranked_matches", "ranked_wins", "ranked_mvps", "ranked_svps", "ranked_kills",
-    "ranked_deaths", "ranked_assists", "ranked_damage_given", "ranked_damage_received",
-    "ranked_heal", "ranked_playtime", "matchup_matches", "matchup_wins"
-]
-ensure_csv_with_headers(leaderboard_csv, leaderboard_headers)
 
 # ---------------------------
 # Asynchronous API Functions
 # ---------------------------
 async def fetch_data(url, retries=10, delay=2, session=None):
     """Fetch JSON data safely using aiohttp, handling rate limits and errors."""
-    global private_profile_count  # (Assuming private_profile_count is defined elsewhere if needed)
+    global private_profile_count
+    cached = response_cache.lookup(url)
+    if cached is not None and cached.fresh:
+        if fixture_recorder is not None:
+            fixture_recorder.record_cached(url, cached.body)
+        return response_cache.decode(cached, endpoint_name(url))
     for attempt in range(retries):
         try:
+            await rate_limiter.acquire_async(url)
             print(f"Requesting {url}")
-            async with session.get(url, headers=headers) as response:
+            async with session.get(url, headers=dict(headers, **response_cache.conditional_headers(cached))) as response:
+                rate_limiter.record(url, response.status)
+                if fixture_recorder is not None:
+                    fixture_recorder.record(url, response.status, response.headers.get("Content-Type"), await response.read())
+                if response.status == 304 and cached is not None:
+                    response_cache.refresh(url)
+                    if fixture_recorder is not None:
+                        fixture_recorder.record_cached(url, cached.body)
+                    return response_cache.decode(cached, endpoint_name(url))
                 if response.status == 429:
-                    retry_after = int(response.headers.get("Retry-After", 5))
-                    print(f"⚠️ Rate limit hit! Sleeping for {retry_after} seconds...")
-                    await asyncio.sleep(retry_after)
+                    pause = rate_limiter.throttle(url, response.headers.get("Retry-After"))
+                    print(f"⚠️ Rate limit hit! Pausing all requests for {pause:.1f} seconds...")
                     continue
                 elif response.status == 500:
                     if "player" in url:
@@ -99,7 +109,7 @@ async def fetch_data(url, retries=10, delay=2, session=None):
                         return None
                     else:
                         print(f"⚠️ Server error (500) on {url}. Retrying...")
-                        await asyncio.sleep(delay)
+                        await asyncio.sleep(rate_limiter.backoff(attempt, delay))
                         continue
                 if response.status >= 400:
                     print(f"⚠️ API Error {response.status}: Skipping {url}")
@@ -108,75 +118,248 @@ async def fetch_data(url, retries=10, delay=2, session=None):
                 if "application/json" not in content_type:
                     print(f"⚠️ Warning: Non-JSON response from {url}. Skipping...")
                     return None
-                return await response.json()
+                body = await response.read()
+                data = loads(body, endpoint_name(url))
+                response_cache.store(url, body, response.headers)
+                return data
         except aiohttp.ClientError as e:
             print(f"❌ Network error fetching {url}: {e}")
         except Exception as e:
             print(f"❌ Error fetching {url}: {e}")
-        await asyncio.sleep(delay)
+        await asyncio.sleep(rate_limiter.backoff(attempt, delay))
     return None  # If all retries fail
 
-async def fetch_player_stats(session, player_id):
-    url = f"https://mrapi.org/api/player/{player_id}"
-    return await fetch_data(url, session=session)
 
-async def fetch_all_players(leaderboard):
-    async with aiohttp.ClientSession() as session:
-        tasks = [fetch_player_stats(session, player["player_id"]) for player in leaderboard]
-        return await asyncio.gather(*tasks)
+class PlayerFetcher:
+    """Fetches player hero stats once per run, however many hero leaderboards list the player.
+
+    Concurrent requests for the same player share one in-flight task, and only the
+    hero_stats part of each profile is kept. A semaphore caps in-flight requests
+    across all heroes. expect() counts how many leaderboard rows will use each
+    player; release() is called once per written row and drops the player's stats
+    after the last one, so memory stays flat however many heroes are processed.
+    """
+
+    def __init__(self, session, concurrency=MAX_CONCURRENCY):
+        self.session = session
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.tasks = {}
+        self.references = Counter()  # player_id -> leaderboard rows still to be written
+        self.fetched = 0
+
+    async def _fetch(self, player_id):
+        async with self.semaphore:
+            player_stats = await fetch_data(PLAYER_API_URL.format(player_id), session=self.session)
+        if not player_stats:
+            return None
+        return {"hero_stats": player_stats.get("hero_stats", {})}
+
+    def expect(self, leaderboard):
+        self.references.update(player["player_id"] for player in leaderboard)
+
+    def get(self, player_id):
+        if player_id not in self.tasks:
+            self.tasks[player_id] = asyncio.ensure_future(self._fetch(player_id))
+            self.fetched += 1
+        return self.tasks[player_id]
+
+    def release(self, player_id):
+        self.references[player_id] -= 1
+        if self.references[player_id] <= 0:
+            del self.references[player_id]
+            self.tasks.pop(player_id, None)
+
+
+async def fetch_all_players(fetcher, leaderboard, window=None):
+    """Yields (player, player_stats) in leaderboard order as soon as each player's stats are in.
+
+    At most `window` players (default: the fetcher's concurrency) are requested ahead
+    of the one being yielded; stats that arrive early wait in this small reorder buffer
+    until every better-ranked player is out, so memory does not grow with the leaderboard.
+    """
+    window = window or fetcher.concurrency
+    players = iter(leaderboard)
+    pending = deque()
+    for player in players:
+        pending.append((player, fetcher.get(player["player_id"])))
+        if len(pending) >= window:
+            break
+    while pending:
+        player, task = pending.popleft()
+        player_stats = await task
+        next_player = next(players, None)
+        if next_player is not None:
+            pending.append((next_player, fetcher.get(next_player["player_id"])))
+        yield player, player_stats
+        fetcher.release(player["player_id"])  # Its row has been written
 
-# Fetch all player stats asynchronously
-player_stats_list = asyncio.run(fetch_all_players(latest_leaderboard))
 
 # Save Hero Meta Data (Win Rate & Pick Rate)
-with open(meta_csv, "a", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    for meta_entry in hero_data.get("meta", []):
-        writer.writerow([
-            timestamp,
-            hero_slug,
-            meta_entry["platform"],
-            meta_entry["mode"],
-            meta_entry["rank"],
-            meta_entry["appearance_rate"],
-            meta_entry["win_rate"]
-        ])
-
-# Save Leaderboard Data
-with open(leaderboard_csv, "a", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    
-    for player, player_stats in zip(latest_leaderboard, player_stats_list):
-        # Extract hero-specific stats
-        ranked_stats = {}
-        matchup_stats = {}
-
-        if player_stats and "hero_stats" in player_stats:
-            hero_stats = player_stats["hero_stats"].get(str(hero_id), {})  
-            ranked_stats = hero_stats.get("ranked", {})
-            matchup_stats = hero_stats.get("matchup", {})
-
-        writer.writerow([
-            timestamp,
-            hero_slug,
-            player["rank"],
-            player["player_name"],
-            player["score"],
-            player["matches"],
-            player["player_id"],
-            ranked_stats.get("matches", 0),
-            ranked_stats.get("wins", 0),
-            ranked_stats.get("mvp", 0),
-            ranked_stats.get("svp", 0),
-            ranked_stats.get("kills", 0),
-            ranked_stats.get("deaths", 0),
-            ranked_stats.get("assists", 0),
-            ranked_stats.get("damage_given", 0),
-            ranked_stats.get("damage_received", 0),
-            ranked_stats.get("heal", 0),
-            ranked_stats.get("playtime", "0s"),
-            matchup_stats.get("matches", 0),
-            matchup_stats.get("wins", 0)
-        ])
-
-print(f"✅ Updated hero stats & leaderboard history for {hero_slug} (Stored in {meta_csv} & {leaderboard_csv}).")
+def save_hero_meta(hero_data, timestamp):
+    hero_slug = hero_data["slug"]
+    meta_csv = os.path.join(META_DIR, f"{hero_slug}.csv")
+    ensure_csv_with_headers(meta_csv, meta_headers)
+    with open(meta_csv, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        for meta_entry in hero_data.get("meta", []):
+            writer.writerow([
+                timestamp,
+                hero_slug,
+                meta_entry["platform"],
+                meta_entry["mode"],
+                meta_entry["rank"],
+                meta_entry["appearance_rate"],
+                meta_entry["win_rate"]
+            ])
+    return meta_csv
+
+
+def build_leaderboard_row(hero_slug, hero_id, player, player_stats, timestamp):
+    # Extract hero-specific stats
+    ranked_stats = {}
+    matchup_stats = {}
+
+    if player_stats and "hero_stats" in player_stats:
+        hero_stats = player_stats["hero_stats"].get(str(hero_id), {})
+        ranked_stats = hero_stats.get("ranked", {})
+        matchup_stats = hero_stats.get("matchup", {})
+
+    return [
+        timestamp,
+        hero_slug,
+        player["rank"],
+        player["player_name"],
+        player["score"],
+        player["matches"],
+        player["player_id"],
+        ranked_stats.get("matches", 0),
+        ranked_stats.get("wins", 0),
+        ranked_stats.get("mvp", 0),
+        ranked_stats.get("svp", 0),
+        ranked_stats.get("kills", 0),
+        ranked_stats.get("deaths", 0),
+        ranked_stats.get("assists", 0),
+        ranked_stats.get("damage_given", 0),
+        ranked_stats.get("damage_received", 0),
+        ranked_stats.get("heal", 0),
+        ranked_stats.get("playtime", "0s"),
+        matchup_stats.get("matches", 0),
+        matchup_stats.get("wins", 0)
+    ]
+
+
+class LeaderboardWriter:
+    """Appends one hero's leaderboard rows as they are built.
+
+    CSV rows are written and flushed one by one; parquet rows are written in
+    batches of PARQUET_BATCH_ROWS (and whatever is left on close()).
+    """
+
+    def __init__(self, hero_slug):
+        self.filename = os.path.join(LEADERBOARD_DIR, f"{hero_slug}.csv")
+        self.file = None
+        self.writer = None
+        self.parquet_rows = [] if storage in ("parquet", "both") else None
+        self.rows_written = 0
+        if storage in ("csv", "both"):
+            ensure_csv_with_headers(self.filename, leaderboard_headers)
+            self.file = open(self.filename, "a", newline="", encoding="utf-8")
+            self.writer = csv.writer(self.file)
+
+    def write(self, row):
+        if self.writer is not None:
+            self.writer.writerow(row)
+            self.file.flush()
+        if self.parquet_rows is not None:
+            self.parquet_rows.append(row)
+            if len(self.parquet_rows) >= PARQUET_BATCH_ROWS:
+                self._write_parquet()
+        self.rows_written += 1
+
+    def _write_parquet(self):
+        if self.parquet_rows:
+            append_hero_leaderboard(pd.DataFrame(self.parquet_rows, columns=leaderboard_headers))
+            self.parquet_rows = []
+
+    def close(self):
+        if self.parquet_rows is not None:
+            self._write_parquet()
+        if self.file is not None:
+            self.file.close()
+
+
+async def process_hero(fetcher, hero_data, latest_leaderboard, timestamp):
+    """Fetch the stats of every player on one hero's leaderboard and write the hero's meta and leaderboard history."""
+    hero_slug = hero_data["slug"]
+    hero_id = hero_data["id"]
+    meta_csv = save_hero_meta(hero_data, timestamp)
+
+    # Stream player stats in rank order and write each row as soon as it is ready
+    leaderboard = LeaderboardWriter(hero_slug)
+    try:
+        async for player, player_stats in fetch_all_players(fetcher, latest_leaderboard):
+            leaderboard.write(build_leaderboard_row(hero_slug, hero_id, player, player_stats, timestamp))
+    finally:
+        leaderboard.close()
+    print(f"✅ Updated hero stats & leaderboard history for {hero_slug} (Stored in {meta_csv} & {leaderboard.filename}).")
+
+
+async def merge_heroes(heroes, concurrency=MAX_CONCURRENCY):
+    """Process heroes concurrently on one event loop with one session and one player fetcher."""
+    # Get timestamp (shared by every hero of this run)
+    timestamp = datetime.utcnow().isoformat()
+    async with aiohttp.ClientSession() as session:
+        fetcher = PlayerFetcher(session, concurrency)
+        # Every leaderboard is counted first, so a player's stats are kept until all its heroes used them
+        leaderboards = [load_leaderboard(hero_data["slug"]) for hero_data in heroes]
+        for leaderboard in leaderboards:
+            fetcher.expect(leaderboard)
+        await asyncio.gather(*(process_hero(fetcher, hero_data, leaderboard, timestamp)
+                               for hero_data, leaderboard in zip(heroes, leaderboards)))
+    print(f"Fetched {fetcher.fetched} distinct players for {len(heroes)} heroes.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append hero meta and hero leaderboard history.")
+    parser.add_argument("hero_slug", nargs="?", help="hero to process, e.g. thor")
+    parser.add_argument("--all", action="store_true", help=f"process every hero in {latest_heroes_file} in one run")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY,
+                        help=f"max in-flight player requests (default {MAX_CONCURRENCY})")
+    args = parser.parse_args()
+    if not args.all and not args.hero_slug:
+        parser.error("either a hero slug or --all is required")
+
+    # Ensure historical directory exists
+    os.makedirs(META_DIR, exist_ok=True)
+    os.makedirs(LEADERBOARD_DIR, exist_ok=True)
+
+    latest_heroes = load_heroes()
+    if args.all:
+        heroes = []
+        for hero_data in latest_heroes:
+            if not hero_data.get("id"):
+                print(f"⚠️ Warning: No hero ID found for {hero_data.get('slug')}, skipping.")
+                continue
+            heroes.append(hero_data)
+    else:
+        # Find the specific hero
+        hero_data = next((h for h in latest_heroes if h["slug"] == args.hero_slug), None)
+        if not hero_data:
+            print(f"⚠️ Error: No hero data found for slug {args.hero_slug}.")
+            sys.exit(1)
+
+        # Extract hero ID for API lookups
+        if not hero_data.get("id"):
+            print(f"⚠️ Error: No hero ID found for {args.hero_slug}.")
+            sys.exit(1)
+        heroes = [hero_data]
+
+    asyncio.run(merge_heroes(heroes, args.concurrency))
+    # Fold this run's meta rows into the daily/weekly rollups (only the touched periods are rewritten)
+    print(f"📊 Rewrote {update_rollups(META_DIR)} hero meta rollup partitions.")
+    response_cache.close()
+    if fixture_recorder is not None:
+        fixture_recorder.close()
+    rate_limiter.print_summary()
+    response_cache.print_summary()
@@ -1,124 +1,172 @@
-import json
 import os
 import csv
 import sys
+import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timezone
+from history_index import HistoryIndex
+from api_payloads import loads
 
-user_to_check = sys.argv[1]  # Get the user ID from the command-line argument
-
-# File paths (dynamic based on USER_TO_CHECK)
-latest_file = f"data/latest/users/{user_to_check}.json"
-stats_csv = f"data/historical/users/{user_to_check}/stats.csv"
-rank_csv = f"data/historical/users/{user_to_check}/rank_history.csv"
-match_csv = f"data/historical/users/{user_to_check}/match_history.csv"
-hero_csv = f"data/historical/users/{user_to_check}/hero_matchups.csv"
-teammates_csv = f"data/historical/users/{user_to_check}/teammates.csv"
-
-# Load latest data
-if os.path.exists(latest_file):
-    with open(latest_file, "r", encoding="utf-8") as f:
-        latest_data = json.load(f)
-else:
-    print("No latest data available.")
-    exit()
-
-os.makedirs(f"data/historical/users/{user_to_check}/", exist_ok=True)
-
-def append_to_csv(data, filename, headers, row_formatter):
-    """ Append new data to CSV, ensuring no duplicates. """
-    file_exists = os.path.exists(filename)
-    
-    if not file_exists:
+LATEST_USERS_DIR = "data/latest/users"
+HISTORICAL_USERS_DIR = "data/historical/users"
+
+
+def append_to_csv(data, filename, headers, row_formatter, order_column=None):
+    """ Append new data to CSV, ensuring no duplicates.
+
+    Duplicates are found through the file's sidecar index (see history_index.py)
+    instead of re-reading the whole history; order_column is the timestamp column.
+    """
+    if not os.path.exists(filename):
         with open(filename, "w", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
             writer.writerow(headers)  # Write headers if file is new
 
-    existing_rows = set()
-    if file_exists:
-        with open(filename, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            next(reader, None)  # Skip header
-            existing_rows = {tuple(row) for row in reader if row}  # Ensure no empty rows
+    index = HistoryIndex(filename, order_column)
 
     # Ensure new rows are formatted correctly
-    new_rows = {tuple(map(lambda x: str(x).strip(), row_formatter(entry))) for entry in data} - existing_rows
+    new_rows = index.new_rows(tuple(map(lambda x: str(x).strip(), row_formatter(entry))) for entry in data)
 
     if new_rows:
         with open(filename, "a", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
             writer.writerows(new_rows)
+    index.add(new_rows)
+
+
+def merge_user(user_to_check, latest_dir=LATEST_USERS_DIR):
+    """Appends the latest profile of one user to their history CSVs. Returns False if there was no latest data."""
+    # File paths (dynamic based on USER_TO_CHECK)
+    latest_file = f"{latest_dir}/{user_to_check}.json"
+    user_dir = f"{HISTORICAL_USERS_DIR}/{user_to_check}"
+    stats_csv = f"{user_dir}/stats.csv"
+    rank_csv = f"{user_dir}/rank_history.csv"
+    match_csv = f"{user_dir}/match_history.csv"
+    hero_csv = f"{user_dir}/hero_matchups.csv"
+    teammates_csv = f"{user_dir}/teammates.csv"
+
+    # Load latest data
+    if not os.path.exists(latest_file):
+        print(f"No latest data available for {user_to_check}.")
+        return False
+    with open(latest_file, "rb") as f:
+        latest_data = loads(f.read(), "player")
 
-# Extract and append overall stats history
-if "stats" in latest_data:
+    os.makedirs(f"{user_dir}/", exist_ok=True)
     timestamp = datetime.now(timezone.utc).isoformat()
-    overall_stats = [
-        [
-            timestamp,
-            latest_data["stats"]["ranked"].get("total_assists", 0),
-            latest_data["stats"]["ranked"].get("total_deaths", 0),
-            latest_data["stats"]["ranked"].get("total_kills", 0),
-            latest_data["stats"]["ranked"].get("total_time_played", "0"),
-            latest_data["stats"]["ranked"].get("total_matches", 0),
-            latest_data["stats"]["ranked"].get("total_wins", 0),
-            latest_data["stats"].get("total_matches", 0),
-            latest_data["stats"].get("total_wins", 0),
-            latest_data["stats"]["unranked"].get("total_assists", 0),
-            latest_data["stats"]["unranked"].get("total_deaths", 0),
-            latest_data["stats"]["unranked"].get("total_kills", 0),
-            latest_data["stats"]["unranked"].get("total_time_played", "0"),
-            latest_data["stats"]["unranked"].get("total_matches", 0),
-            latest_data["stats"]["unranked"].get("total_wins", 0)
+
+    # Extract and append overall stats history
+    if "stats" in latest_data:
+        overall_stats = [
+            [
+                timestamp,
+                latest_data["stats"]["ranked"].get("total_assists", 0),
+                latest_data["stats"]["ranked"].get("total_deaths", 0),
+                latest_data["stats"]["ranked"].get("total_kills", 0),
+                latest_data["stats"]["ranked"].get("total_time_played", "0"),
+                latest_data["stats"]["ranked"].get("total_matches", 0),
+                latest_data["stats"]["ranked"].get("total_wins", 0),
+                latest_data["stats"].get("total_matches", 0),
+                latest_data["stats"].get("total_wins", 0),
+                latest_data["stats"]["unranked"].get("total_assists", 0),
+                latest_data["stats"]["unranked"].get("total_deaths", 0),
+                latest_data["stats"]["unranked"].get("total_kills", 0),
+                latest_data["stats"]["unranked"].get("total_time_played", "0"),
+                latest_data["stats"]["unranked"].get("total_matches", 0),
+                latest_data["stats"]["unranked"].get("total_wins", 0)
+            ]
+        ]
+
+        append_to_csv(overall_stats, stats_csv, [
+            "timestamp", "ranked_assists", "ranked_deaths", "ranked_kills", "ranked_time_played",
+            "ranked_matches", "ranked_matches_wins", "total_matches", "total_wins",
+            "unranked_assists", "unranked_deaths", "unranked_kills", "unranked_time_played",
+            "unranked_matches", "unranked_matches_wins"
+        ], lambda x: x, order_column=0)
+
+    # Extract and append rank history
+    if "rank_history" in latest_data:
+        rank_history = [
+            [
+                entry["timestamp"], entry["rank"]["old_level"], entry["rank"]["new_level"],
+                entry["rank"]["old_score"], entry["rank"]["new_score"]
+            ]
+            for entry in latest_data["rank_history"]
+        ]
+        append_to_csv(rank_history, rank_csv, ["timestamp", "from_level", "to_level", "old_score", "new_score"], lambda x: x, order_column=0)
+
+    # Extract and append match history
+    if "match_history" in latest_data:
+        match_history = [
+            (
+                entry["match_uid"], entry["match_map"]["id"], entry["match_duration"]["raw"], entry["season"],
+                entry["winner_side"], entry["mvp_uid"], entry["svp_uid"], entry["match_timestamp"],
+                entry["gamemode"]["id"], entry["stats"]["kills"], entry["stats"]["deaths"], entry["stats"]["assists"],
+                entry["stats"]["is_win"], entry["stats"]["hero"]["id"], entry["stats"]["has_escaped"]
+            )
+            for entry in latest_data["match_history"]
+        ]
+        append_to_csv(match_history, match_csv, [
+            "match_uid", "map_id", "duration", "season", "winner_side", "mvp_uid", "svp_uid", "timestamp",
+            "game_mode_id", "kills", "deaths", "assists", "is_win", "hero_id", "has_escaped"
+        ], lambda x: x, order_column=7)
+
+    # Extract and append hero matchup history
+    if "hero_stats" in latest_data:
+        hero_matchups = [
+            [timestamp, hero_id, hero_data["matchup"]["matches"], hero_data["matchup"]["wins"]]
+            for hero_id, hero_data in latest_data["hero_stats"].items() if "matchup" in hero_data
         ]
-    ]
-    
-    append_to_csv(overall_stats, stats_csv, [
-        "timestamp", "ranked_assists", "ranked_deaths", "ranked_kills", "ranked_time_played", 
-        "ranked_matches", "ranked_matches_wins", "total_matches", "total_wins",
-        "unranked_assists", "unranked_deaths", "unranked_kills", "unranked_time_played", 
-        "unranked_matches", "unranked_matches_wins"
-    ], lambda x: x)
-
-# Extract and append rank history
-if "rank_history" in latest_data:
-    rank_history = [
-        [
-            entry["timestamp"], entry["rank"]["old_level"], entry["rank"]["new_level"],
-            entry["rank"]["old_score"], entry["rank"]["new_score"]
+        append_to_csv(hero_matchups, hero_csv, ["timestamp", "hero_id", "matches", "wins"], lambda x: x, order_column=0)
+
+    # Extract and append teammate history
+    if "teammates" in latest_data:
+        team_mates = [
+            [timestamp, entry["player_uid"], entry["stats"]["matches"], entry["stats"]["wins"]]
+            for entry in latest_data["teammates"]
         ]
-        for entry in latest_data["rank_history"]
-    ]
-    append_to_csv(rank_history, rank_csv, ["timestamp", "from_level", "to_level", "old_score", "new_score"], lambda x: x)
-
-# Extract and append match history
-if "match_history" in latest_data:
-    match_history = [
-        (
-            entry["match_uid"], entry["match_map"]["id"], entry["match_duration"]["raw"], entry["season"],
-            entry["winner_side"], entry["mvp_uid"], entry["svp_uid"], entry["match_timestamp"], 
-            entry["gamemode"]["id"], entry["stats"]["kills"], entry["stats"]["deaths"], entry["stats"]["assists"], 
-            entry["stats"]["is_win"], entry["stats"]["hero"]["id"], entry["stats"]["has_escaped"]
-        )
-        for entry in latest_data["match_history"]
-    ]
-    append_to_csv(match_history, match_csv, [
-        "match_uid", "map_id", "duration", "season", "winner_side", "mvp_uid", "svp_uid", "timestamp", 
-        "game_mode_id", "kills", "deaths", "assists", "is_win", "hero_id", "has_escaped"
-    ], lambda x: x)
-
-# Extract and append hero matchup history
-if "hero_stats" in latest_data:
-    hero_matchups = [
-        [timestamp, hero_id, hero_data["matchup"]["matches"], hero_data["matchup"]["wins"]]
-        for hero_id, hero_data in latest_data["hero_stats"].items() if "matchup" in hero_data
-    ]
-    append_to_csv(hero_matchups, hero_csv, ["timestamp", "hero_id", "matches", "wins"], lambda x: x)
-
-# Extract and append teammate history
-if "teammates" in latest_data:
-    team_mates = [
-        [timestamp, entry["player_uid"], entry["stats"]["matches"], entry["stats"]["wins"]]
-        for entry in latest_data["teammates"]
-    ]
-    append_to_csv(team_mates, teammates_csv, ["timestamp", "player_uid", "matches", "wins"], lambda x: x)
-
-print("Latest data appended to CSV files.")
+        append_to_csv(team_mates, teammates_csv, ["timestamp", "player_uid", "matches", "wins"], lambda x: x, order_column=0)
+    return True
+
+
+def merge_users(users, latest_dir=LATEST_USERS_DIR, workers=None):
+    """Merges many users in a process pool (each user only touches their own files).
+
+    Returns (users merged, users that failed); the serial path stops at the first failure instead.
+    """
+    if len(users) == 1 or workers == 1:
+        return [user for user in users if merge_user(user, latest_dir)], []
+    merged = []
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        future_to_user = {executor.submit(merge_user, user, latest_dir): user for user in users}
+        for future in as_completed(future_to_user):
+            user = future_to_user[future]
+            try:
+                if future.result():
+                    merged.append(user)
+            except Exception as e:
+                print(f"❌ Error merging user {user}: {e}")
+                failed.append(user)
+    return merged, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append the latest user profiles to their history CSVs.")
+    parser.add_argument("users", nargs="*", help="user IDs to merge (default: every profile in --dir)")
+    parser.add_argument("--dir", default=LATEST_USERS_DIR,
+                        help=f"directory of latest <user>.json profiles (default {LATEST_USERS_DIR})")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    users = args.users or sorted(os.path.splitext(os.path.basename(path))[0] for path in glob.glob(os.path.join(args.dir, "*.json")))
+    if not users:
+        print("No latest data available.")
+        sys.exit(0)
+
+    merged, failed = merge_users(users, args.dir, args.workers)
+    print(f"Latest data appended to CSV files for {len(merged)} of {len(users)} users.")
+    if failed:
+        print(f"❌ Merging failed for {len(failed)} users: {', '.join(sorted(failed))}")
+        sys.exit(1)
@@ -0,0 +1,303 @@
+import argparse
+import glob
+import os
+import re
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Segments: data/historical/player_registry/segment-000001.parquet, ... (later segments win)
+PLAYER_REGISTRY_DIR = "data/historical/player_registry/"
+PLAYER_ENCOUNTERS_FILE = "data/historical/player_encounters.csv"  # The old full-rewrite CSV, imported once
+MAX_SEGMENTS = 16  # Segments are merged into one once there are this many
+SEGMENT_PATTERN = re.compile(r"segment-(\d+)\.parquet$")
+COUNT_COLUMNS = ("highest_score", "latest_score", "matches", "wins")
+SCORE_COLUMNS = ("highest_score", "latest_score")  # float64, NaN (null on disk) when unknown
+FIELDS = ["player_uid", "player_name"] + list(COUNT_COLUMNS)
+COLUMN_TYPES = {name: np.float64 if name in SCORE_COLUMNS else np.int32 for name in COUNT_COLUMNS}
+
+SEGMENT_SCHEMA = pa.schema([
+    ("player_uid", pa.int64()),
+    ("player_name", pa.dictionary(pa.int32(), pa.string())),
+    ("highest_score", pa.float64()),
+    ("latest_score", pa.float64()),
+    ("matches", pa.int32()),
+    ("wins", pa.int32()),
+])
+
+
+def _score(value):
+    """A rank score as a float, NaN if the API sent none (the API may send fractional scores)."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _count(value):
+    """A match or win count as an int: rounded to the nearest integer, 0 if unknown."""
+    value = _score(value)
+    return 0 if np.isnan(value) else int(round(value))
+
+
+def _convert(name, value):
+    return _score(value) if name in SCORE_COLUMNS else _count(value)
+
+
+class PlayerRegistry:
+    """Every player ever encountered, with their scores, held in typed arrays.
+
+    Players get dense integer ids; uid -> id is a sorted array of the players loaded
+    from disk (binary search) plus a dict of the ones added during this run. Scores
+    are float64 columns (NaN when unknown), match and win counts int32 columns, and
+    names are interned into one table referenced by int32 codes. save() appends only the rows changed since the last save as a new Parquet
+    segment; once there are MAX_SEGMENTS of them they are merged into one.
+    Safe to update from several threads.
+    """
+
+    def __init__(self, directory=PLAYER_REGISTRY_DIR, legacy_csv=None):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.size = 0
+        self.uids = np.zeros(0, dtype=np.int64)
+        self.columns = {name: np.zeros(0, dtype=COLUMN_TYPES[name]) for name in COUNT_COLUMNS}
+        self.name_codes = np.zeros(0, dtype=np.int32)
+        self.names = []  # Interned names, indexed by name code
+        self._name_index = {}
+        self._sorted_uids = np.zeros(0, dtype=np.int64)  # uids of the loaded players, sorted ...
+        self._sorted_ids = np.zeros(0, dtype=np.int64)  # ... and their ids
+        self._new_ids = {}  # uid -> id of players added since the load
+        self.dirty = set()  # ids changed since the last save
+        self._load(legacy_csv)
+
+    # ---------------------------
+    # Lookups
+    # ---------------------------
+    def _id(self, uid):
+        uid = int(uid)
+        player_id = self._new_ids.get(uid)
+        if player_id is not None:
+            return player_id
+        position = np.searchsorted(self._sorted_uids, uid)
+        if position < len(self._sorted_uids) and self._sorted_uids[position] == uid:
+            return int(self._sorted_ids[position])
+        return None
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, uid):
+        return self._id(uid) is not None
+
+    def _row(self, player_id):
+        row = {"player_name": self.names[self.name_codes[player_id]]}
+        for name in COUNT_COLUMNS:
+            value = self.columns[name][player_id]
+            if name in SCORE_COLUMNS:
+                row[name] = None if np.isnan(value) else float(value)
+            else:
+                row[name] = int(value)
+        return row
+
+    def get(self, uid, default=None):
+        """The player's fields as a dict, like the old encountered_players entries."""
+        with self.lock:
+            player_id = self._id(uid)
+            return default if player_id is None else self._row(player_id)
+
+    # ---------------------------
+    # Updates
+    # ---------------------------
+    def _intern(self, name):
+        code = self._name_index.get(name)
+        if code is None:
+            code = self._name_index[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def _grow(self, capacity):
+        if capacity <= len(self.uids):
+            return
+        capacity = max(capacity, 2 * len(self.uids), 1024)
+        self.uids = np.resize(self.uids, capacity)
+        self.name_codes = np.resize(self.name_codes, capacity)
+        for name in COUNT_COLUMNS:
+            self.columns[name] = np.resize(self.columns[name], capacity)
+
+    def _add(self, uid, player_name):
+        player_id = self.size
+        self._grow(player_id + 1)
+        self.uids[player_id] = uid
+        self.name_codes[player_id] = self._intern(player_name)
+        for name in COUNT_COLUMNS:
+            self.columns[name][player_id] = np.nan if name in SCORE_COLUMNS else 0
+        self._new_ids[uid] = player_id
+        self.size += 1
+        return player_id
+
+    def record(self, uid, player_name, latest_score, matches, wins):
+        """Updates a player from a fresh profile; the highest score only ever goes up (0 means unranked).
+
+        A missing score (None) is stored as unknown and never replaces the highest score.
+        """
+        uid = int(uid)
+        latest_score = _score(latest_score)
+        with self.lock:
+            player_id = self._id(uid)
+            if player_id is None:
+                player_id = self._add(uid, player_name or "")
+                self.columns["highest_score"][player_id] = latest_score
+            else:
+                highest = self.columns["highest_score"][player_id]
+                if latest_score != 0 and (np.isnan(highest) or latest_score > highest):
+                    self.columns["highest_score"][player_id] = latest_score
+            self.columns["latest_score"][player_id] = latest_score
+            self.columns["matches"][player_id] = _count(matches)
+            self.columns["wins"][player_id] = _count(wins)
+            self.dirty.add(player_id)
+
+    def _set_rows(self, uids, player_names, counts):
+        """Stores whole rows (from disk or a checkpoint), replacing what is there."""
+        for row, uid in enumerate(uids):
+            uid = int(uid)
+            player_id = self._id(uid)
+            if player_id is None:
+                player_id = self._add(uid, player_names[row] or "")
+            else:
+                self.name_codes[player_id] = self._intern(player_names[row] or "")
+            for name in COUNT_COLUMNS:
+                self.columns[name][player_id] = _convert(name, counts[name][row])
+            self.dirty.add(player_id)
+
+    def changes(self):
+        """The rows changed since the last save, column-wise (small enough for the crawl checkpoint)."""
+        with self.lock:
+            ids = np.array(sorted(self.dirty), dtype=np.int64)
+            changed = {"player_uid": self.uids[ids].tolist(),
+                       "player_name": [self.names[code] for code in self.name_codes[ids]]}
+            changed.update({name: self.columns[name][ids].tolist() for name in COUNT_COLUMNS})
+        return changed
+
+    def apply(self, changed):
+        """Re-applies rows returned by changes(); older checkpoints hold a {uid: fields} dict instead."""
+        if changed and "player_uid" not in changed:
+            changed = {field: [uid if field == "player_uid" else row[field] for uid, row in changed.items()]
+                       for field in FIELDS}
+        if not changed:
+            return
+        with self.lock:
+            self._set_rows(changed["player_uid"], changed["player_name"], changed)
+
+    # ---------------------------
+    # Storage
+    # ---------------------------
+    def _segments(self):
+        segments = []
+        for path in glob.glob(os.path.join(self.directory, "segment-*.parquet")):
+            match = SEGMENT_PATTERN.search(os.path.basename(path))
+            if match:
+                segments.append((int(match.group(1)), path))
+        return sorted(segments)
+
+    def _load(self, legacy_csv=None):
+        segments = self._segments()
+        if not segments:
+            if legacy_csv and os.path.exists(legacy_csv):
+                self.import_csv(legacy_csv)
+            return
+
+        # Segments written before scores were float64 hold them as int32
+        table = pa.concat_tables([pq.read_table(path).select(SEGMENT_SCHEMA.names).cast(SEGMENT_SCHEMA) for _, path in segments])
+        uids = table.column("player_uid").to_numpy()
+        # Later segments win; ids follow the order players were first seen
+        _, first = np.unique(uids, return_index=True)
+        unique_uids, last_reversed = np.unique(uids[::-1], return_index=True)
+        last = len(uids) - 1 - last_reversed
+        order = np.argsort(first, kind="stable")
+        rows = last[order]
+
+        self.size = len(rows)
+        self.uids = uids[rows]
+        codes, names = pd.factorize(table.column("player_name").to_pandas().astype(str).to_numpy()[rows])
+        self.name_codes = codes.astype(np.int32)
+        self.names = list(names)
+        self._name_index = {name: code for code, name in enumerate(self.names)}
+        for name in COUNT_COLUMNS:
+            self.columns[name] = table.column(name).to_numpy(zero_copy_only=False).astype(COLUMN_TYPES[name])[rows]
+        self._sorted_uids = unique_uids
+        self._sorted_ids = np.empty(len(order), dtype=np.int64)
+        self._sorted_ids[order] = np.arange(len(order))
+
+    def _table(self, ids):
+        return pa.table({
+            "player_uid": pa.array(self.uids[ids], type=pa.int64()),
+            "player_name": pa.array([self.names[code] for code in self.name_codes[ids]], type=pa.string()).dictionary_encode(),
+            **{name: pa.array(self.columns[name][ids], type=SEGMENT_SCHEMA.field(name).type, from_pandas=True)
+               for name in COUNT_COLUMNS},
+        }, schema=SEGMENT_SCHEMA)
+
+    def _write_segment(self, number, ids):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"segment-{number:06d}.parquet")
+        pq.write_table(self._table(ids), path + ".tmp", compression="zstd")
+        os.replace(path + ".tmp", path)
+        return path
+
+    def save(self, merge=False):
+        """Writes the rows changed since the last save as a new segment. Returns the number of rows written.
+
+        With merge (or once there are MAX_SEGMENTS segments) every player is written
+        to one segment that replaces all the others.
+        """
+        with self.lock:
+            segments = self._segments()
+            number = segments[-1][0] + 1 if segments else 1
+            if merge or len(segments) >= MAX_SEGMENTS:
+                self._write_segment(number, np.arange(self.size))
+                for _, path in segments:
+                    os.remove(path)
+                written = self.size
+            elif self.dirty:
+                written = len(self.dirty)
+                self._write_segment(number, np.array(sorted(self.dirty), dtype=np.int64))
+            else:
+                written = 0
+            self.dirty = set()
+        return written
+
+    def import_csv(self, path):
+        """Loads the old player_encounters.csv (all of its rows become changes for the next save)."""
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        df["player_uid"] = pd.to_numeric(df["player_uid"], errors="coerce")
+        df = df.dropna(subset=["player_uid"])
+        counts = {name: pd.to_numeric(df[name], errors="coerce").to_numpy() for name in COUNT_COLUMNS}
+        with self.lock:
+            self._set_rows(df["player_uid"].astype(np.int64).to_numpy(), df["player_name"].tolist(), counts)
+        print(f"Imported {len(df)} encountered players from {path}.")
+
+    def to_frame(self):
+        ids = np.arange(self.size)
+        df = pd.DataFrame({"player_uid": self.uids[ids],
+                           "player_name": np.array(self.names, dtype=object)[self.name_codes[ids]] if self.names else []})
+        for name in COUNT_COLUMNS:
+            df[name] = self.columns[name][ids]
+        return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintenance for the encountered player registry.")
+    parser.add_argument("command", choices=["stats", "compact", "export"])
+    parser.add_argument("--output", default=PLAYER_ENCOUNTERS_FILE, help=f"CSV written by export (default {PLAYER_ENCOUNTERS_FILE})")
+    args = parser.parse_args()
+
+    registry = PlayerRegistry(legacy_csv=PLAYER_ENCOUNTERS_FILE)
+    if args.command == "compact":
+        registry.save(merge=True)
+    elif args.command == "export":
+        registry.to_frame().to_csv(args.output, index=False)
+        print(f"Exported {len(registry)} players to {args.output}.")
+    segments = registry._segments()
+    print(f"{len(registry)} players, {len(registry.names)} distinct names, {len(segments)} segments "
+          f"({sum(os.path.getsize(path) for _, path in segments) / 1024 / 1024:.1f} MB)")
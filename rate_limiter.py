@@ -0,0 +1,127 @@
+import asyncio
+import random
+import threading
+import time
+from collections import defaultdict
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+# Defaults (mrapi.org allows 500 calls per minute, we stay a bit below)
+DEFAULT_RATE_PER_MINUTE = 480
+DEFAULT_RETRY_AFTER = 5  # Seconds to pause when a 429 has no Retry-After header
+MIN_RATE_PER_MINUTE = 60  # Never throttle ourselves below one call per second
+MAX_BACKOFF = 60
+
+
+def endpoint_name(url):
+    """Returns the API endpoint of a URL, e.g. 'player' for https://mrapi.org/api/player/123."""
+    path = urlparse(url).path.strip("/").split("/")
+    if "api" in path:
+        path = path[path.index("api") + 1:]
+    return path[0] if path and path[0] else "root"
+
+
+def parse_retry_after(value, default=DEFAULT_RETRY_AFTER):
+    """Parses a Retry-After header (seconds or HTTP date) into seconds to wait."""
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class RateLimiter:
+    """Token bucket shared by every worker (threads and asyncio tasks) of one process.
+
+    Every request takes a token before it is sent. A 429 pauses the whole bucket for
+    the Retry-After period and halves the refill rate; each successful response
+    slowly restores it towards the configured rate.
+    """
+
+    def __init__(self, rate_per_minute=DEFAULT_RATE_PER_MINUTE, burst=None, min_rate_per_minute=MIN_RATE_PER_MINUTE):
+        self.max_rate = rate_per_minute / 60.0
+        self.min_rate = min(min_rate_per_minute, rate_per_minute) / 60.0
+        self.rate = self.max_rate
+        self.capacity = burst if burst is not None else max(1, int(self.max_rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+        self.stats = defaultdict(lambda: defaultdict(float))
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _reserve(self, endpoint):
+        """Takes a token and returns how long the caller has to wait before sending."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = max(-self.tokens / self.rate, self.paused_until - now, 0.0)
+            self.stats[endpoint]["requests"] += 1
+            self.stats[endpoint]["wait_seconds"] += wait
+            return wait
+
+    def _pause_remaining(self):
+        with self.lock:
+            return max(0.0, self.paused_until - time.monotonic())
+
+    def acquire(self, url):
+        """Blocks the calling thread until a request to url may be sent."""
+        time.sleep(self._reserve(endpoint_name(url)))
+        # Another worker may have been throttled while we slept
+        while (pause := self._pause_remaining()) > 0:
+            time.sleep(pause)
+
+    async def acquire_async(self, url):
+        """Waits (without blocking the event loop) until a request to url may be sent."""
+        await asyncio.sleep(self._reserve(endpoint_name(url)))
+        while (pause := self._pause_remaining()) > 0:
+            await asyncio.sleep(pause)
+
+    def record(self, url, status):
+        """Counts a response and lets the rate recover after successful calls."""
+        endpoint = endpoint_name(url)
+        with self.lock:
+            self.stats[endpoint][f"status_{status}"] += 1
+            if status < 400 and self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 50)
+
+    def throttle(self, url, retry_after=None):
+        """Pauses every worker after a 429 and lowers the request rate.
+
+        Returns the number of seconds the bucket is paused for.
+        """
+        endpoint = endpoint_name(url)
+        pause = parse_retry_after(retry_after) + random.uniform(0, 1)
+        with self.lock:
+            now = time.monotonic()
+            self.paused_until = max(self.paused_until, now + pause)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+            self.updated = now
+            self.stats[endpoint]["throttled"] += 1
+            self.stats[endpoint]["throttle_seconds"] += pause
+        return pause
+
+    @staticmethod
+    def backoff(attempt, base=2, cap=MAX_BACKOFF):
+        """Exponential backoff with full jitter for retries of failed requests."""
+        return random.uniform(0, min(cap, base * 2 ** attempt))
+
+    def summary(self):
+        """Returns the per-endpoint counters as a plain dict."""
+        with self.lock:
+            return {endpoint: dict(counters) for endpoint, counters in self.stats.items()}
+
+    def print_summary(self):
+        for endpoint, counters in sorted(self.summary().items()):
+            parts = ", ".join(f"{key}={round(value, 1):g}" for key, value in sorted(counters.items()))
+            print(f"📊 {endpoint}: {parts}")
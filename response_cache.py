@@ -0,0 +1,198 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from rate_limiter import endpoint_name
+from api_payloads import loads
+
+RESPONSE_CACHE_FILE = os.getenv("RESPONSE_CACHE_FILE", ".cache/mrapi_responses.sqlite")
+MAX_CACHE_BYTES = 512 * 1024 * 1024  # Least recently used responses are evicted above this size
+EVICT_EVERY = 200  # Stores between size checks
+
+# Seconds a response is served without asking the server; None = forever (match results never change).
+# Endpoints not listed here are never cached.
+ENDPOINT_TTLS = {
+    "match": None,
+    "player": 30 * 60,
+}
+# Requesting a URL of the key endpoint makes the cached response of the value endpoint stale
+INVALIDATES = {
+    "player-update": "player",
+}
+
+CachedResponse = namedtuple("CachedResponse", ["body", "etag", "last_modified", "fresh"])
+
+
+class ResponseCache:
+    """Local cache of mrapi.org JSON responses, shared by every script and run on this machine.
+
+    Responses are kept in one SQLite table keyed by URL. A response younger than its
+    endpoint's TTL is served without a request; an older one is revalidated with
+    If-None-Match / If-Modified-Since when the server sent an ETag or Last-Modified.
+    Once the cache grows past max_bytes the least recently used responses are
+    evicted. Safe to share between threads.
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_FILE, max_bytes=MAX_CACHE_BYTES, ttls=None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = ENDPOINT_TTLS if ttls is None else ttls
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY,"
+            " endpoint TEXT NOT NULL,"
+            " body BLOB NOT NULL,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " fetched_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL"
+            ")"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self.conn.commit()
+        self.stores = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def cacheable(self, url):
+        return endpoint_name(url) in self.ttls
+
+    def lookup(self, url):
+        """Returns the CachedResponse for url, or None.
+
+        Looking up a URL that refreshes data server-side (see INVALIDATES) drops the
+        cached copy of that data instead.
+        """
+        endpoint = endpoint_name(url)
+        if endpoint in INVALIDATES:
+            self.invalidate(url.replace(f"/{endpoint}/", f"/{INVALIDATES[endpoint]}/", 1))
+            return None
+        if endpoint not in self.ttls:
+            return None
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (now, url))
+        body, etag, last_modified, fetched_at = row
+        ttl = self.ttls[endpoint]
+        fresh = ttl is None or now - fetched_at < ttl
+        if fresh:
+            self.hits += 1
+        return CachedResponse(body, etag, last_modified, fresh)
+
+    @staticmethod
+    def conditional_headers(cached):
+        """Request headers that let the server answer 304 if cached is still current."""
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        return headers
+
+    @staticmethod
+    def decode(cached, endpoint=None):
+        """The cached body decoded with the endpoint's schema (see api_payloads.py)."""
+        return loads(cached.body, endpoint)
+
+    def store(self, url, body, response_headers):
+        """Caches a 200 response body (bytes) of a cacheable endpoint."""
+        endpoint = endpoint_name(url)
+        if endpoint not in self.ttls:
+            return
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (url, endpoint, body, etag, last_modified, fetched_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, endpoint, body, response_headers.get("ETag"), response_headers.get("Last-Modified"), now, now),
+            )
+            self.stores += 1
+            if self.stores % EVICT_EVERY == 0:
+                self._evict()
+            self.conn.commit()
+
+    def refresh(self, url):
+        """Marks a cached response as current again after the server answered 304."""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+            self.conn.commit()
+            self.revalidated += 1
+
+    def invalidate(self, url):
+        with self.lock:
+            self.conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self.conn.commit()
+
+    def size(self):
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM responses").fetchone()[0]
+
+    def _evict(self):
+        """Deletes least recently used responses until the cache fits in max_bytes again (lock held)."""
+        total = self.conn.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        evicted = []
+        for url, size in self.conn.execute("SELECT url, LENGTH(body) FROM responses ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((url,))
+            total -= size
+        self.conn.executemany("DELETE FROM responses WHERE url = ?", evicted)
+        return len(evicted)
+
+    def prune(self):
+        with self.lock:
+            evicted = self._evict()
+            self.conn.commit()
+        return evicted
+
+    def summary(self):
+        return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses, "stored": self.stores}
+
+    def print_summary(self):
+        print("🗄️ Response cache: " + ", ".join(f"{key}={value}" for key, value in self.summary().items()))
+
+    def close(self):
+        with self.lock:
+            self._evict()
+            self.conn.commit()
+            self.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintenance for the local mrapi.org response cache.")
+    parser.add_argument("command", choices=["stats", "prune", "clear"])
+    parser.add_argument("--max-mb", type=int, default=MAX_CACHE_BYTES // (1024 * 1024),
+                        help=f"size cap used by prune (default {MAX_CACHE_BYTES // (1024 * 1024)})")
+    args = parser.parse_args()
+
+    cache = ResponseCache(max_bytes=args.max_mb * 1024 * 1024)
+    if args.command == "prune":
+        print(f"Evicted {cache.prune()} responses.")
+    elif args.command == "clear":
+        with cache.lock:
+            cache.conn.execute("DELETE FROM responses")
+            cache.conn.commit()
+    for endpoint, count, size in cache.conn.execute(
+        "SELECT endpoint, COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM responses GROUP BY endpoint ORDER BY endpoint"
+    ):
+        print(f"{endpoint}: {count} responses, {size / 1024 / 1024:.1f} MB")
+    cache.close()
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+
+
+class ClaimSet:
+    """Set of IDs with an atomic test-and-add, so only one worker ever wins an ID."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.items = set()
+
+    def claim(self, item):
+        """Adds item and returns True, or returns False if someone claimed it before."""
+        with self.lock:
+            if item in self.items:
+                return False
+            self.items.add(item)
+            return True
+
+    def add(self, item):
+        with self.lock:
+            self.items.add(item)
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key (e.g. a URL) into one.
+
+    The first caller runs the function; callers arriving while it runs wait for it
+    and get the same result (or exception). Nothing is remembered afterwards.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.shared = 0
+
+    def do(self, key, func):
+        """Returns (result, shared); shared is True if the result came from another caller's call."""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.value, False
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop."""
+
+    def __init__(self):
+        self.calls = {}
+        self.shared = 0
+
+    async def do(self, key, func):
+        """Awaits func() unless a call with the same key is already running. Returns (result, shared)."""
+        future = self.calls.get(key)
+        if future is not None:
+            self.shared += 1
+            # Shielded so a cancelled follower does not cancel the leader's call
+            return await asyncio.shield(future), True
+
+        future = self.calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Followers re-raise it; don't warn if there were none
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            del self.calls[key]
+        return value, False